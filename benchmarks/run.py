@@ -0,0 +1,230 @@
+"""
+Copyright 2019-2020 AWS DeepRacer Community. All Rights Reserved.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+# Benchmarks of deepracer-utils loaders and analyses on synthetic data.
+#
+# Runs offline, data is generated into a temporary folder. Usage:
+#
+#     python benchmarks/run.py --scale small
+#     python benchmarks/run.py --scale large --only load,agg --json results.json
+#     python benchmarks/run.py --compare results.json
+#
+# For each benchmark the wall time, throughput (rows per second) and peak memory
+# allocated while running it are reported.
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import matplotlib
+matplotlib.use("Agg")  # noqa: E402
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # noqa: E402
+
+import matplotlib.pyplot as plt  # noqa: E402
+
+from benchmarks import synthetic  # noqa: E402
+from deepracer.logs import ActionBreakdownUtils, AnalysisUtils, DeepRacerLog, \
+    NewRewardUtils, PlottingUtils, SimulationLogsIO  # noqa: E402
+from deepracer.tracks import Track  # noqa: E402
+
+
+# episodes in the RoboMaker log, iterations x episodes per iteration x workers in simtraces,
+# steps replayed with a new reward, steps plotted
+SCALES = {
+    "small": dict(episodes=200, iterations=10, episodes_per_iteration=20, workers=2,
+                  reward_steps=2000, plot_steps=20000),
+    "medium": dict(episodes=2000, iterations=50, episodes_per_iteration=20, workers=3,
+                   reward_steps=10000, plot_steps=200000),
+    "large": dict(episodes=20000, iterations=200, episodes_per_iteration=20, workers=4,
+                  reward_steps=50000, plot_steps=2000000),
+}
+
+
+class Benchmarks:
+    """Prepares the data and defines the benchmarks
+
+    Each benchmark is a method named bench_<name> returning a function to measure and
+    the number of rows it processes.
+    """
+
+    def __init__(self, folder, scale):
+        self.folder = folder
+        self.scale = scale
+        self.waypoints = synthetic.make_track()
+        self.track = Track("synthetic_oval", self.waypoints)
+
+        self.log_path = os.path.join(folder, "robomaker.log")
+        self.log_rows = synthetic.write_robomaker_log(
+            self.log_path, scale["episodes"], waypoints=self.waypoints)
+
+        self.single_folder = os.path.join(folder, "drfc-single")
+        self.single_rows = synthetic.write_simtrace_folder(
+            self.single_folder, "drfc-single", scale["iterations"],
+            scale["episodes_per_iteration"], waypoints=self.waypoints)
+
+        self.multi_folder = os.path.join(folder, "drfc-multi")
+        self.multi_rows = synthetic.write_simtrace_folder(
+            self.multi_folder, "drfc-multi", scale["iterations"],
+            scale["episodes_per_iteration"], scale["workers"], waypoints=self.waypoints)
+
+        self.reward_module = synthetic.write_reward_module(os.path.join(folder, "reward"))
+        sys.path.insert(0, os.path.join(folder, "reward"))
+
+        self._df = None
+
+    def df(self):
+        if self._df is None:
+            log = DeepRacerLog(self.multi_folder)
+            log.load()
+            self._df = log.dataframe()
+        return self._df
+
+    def bench_load_data(self):
+        return lambda: SimulationLogsIO.load_data(self.log_path), self.log_rows
+
+    def bench_convert_to_pandas(self):
+        data = SimulationLogsIO.load_data(self.log_path)
+        return lambda: SimulationLogsIO.convert_to_pandas(data), self.log_rows
+
+    def bench_load_single(self):
+        def load():
+            DeepRacerLog(self.single_folder).load()
+        return load, self.single_rows
+
+    def bench_load_multi(self):
+        def load():
+            DeepRacerLog(self.multi_folder).load()
+        return load, self.multi_rows
+
+    def bench_agg(self):
+        df = self.df()
+        return lambda: AnalysisUtils.simulation_agg(df, is_eval=True), df.shape[0]
+
+    def bench_agg_training(self):
+        df = self.df().copy()
+        df["new_reward"] = df["reward"]
+        return lambda: AnalysisUtils.simulation_agg(df), df.shape[0]
+
+    def bench_new_reward(self):
+        df = SimulationLogsIO.convert_to_pandas(SimulationLogsIO.load_data(self.log_path))
+        df = df.iloc[:self.scale["reward_steps"]].copy()
+        return lambda: NewRewardUtils.new_reward(
+            df, self.track.center_line, self.reward_module), df.shape[0]
+
+    def bench_plot_track(self):
+        df = self.df().iloc[:self.scale["plot_steps"]]
+        return lambda: PlottingUtils.plot_track(df, self.track), df.shape[0]
+
+    def bench_action_breakdown(self):
+        df = self.df().iloc[:self.scale["plot_steps"]]
+        return lambda: ActionBreakdownUtils.action_breakdown(df, self.track), df.shape[0]
+
+
+def measure(function, memory=True):
+    """Runs the function and measures wall time and, if requested, in a second run,
+    the peak of memory allocated by it
+
+    Returns:
+    Tuple of (seconds, peak bytes or None)
+    """
+    start = time.perf_counter()
+    function()
+    seconds = time.perf_counter() - start
+    plt.close("all")
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            function()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+            plt.close("all")
+
+    return seconds, peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmarks of deepracer-utils loaders and analyses")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--only", help="comma separated list of benchmarks to run")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the peak memory measurement (halves the run time)")
+    parser.add_argument("--json", help="file to save the results to")
+    parser.add_argument("--compare", help="results file to compare against")
+    parser.add_argument("--data", help="folder to generate the data in (kept after the run)")
+    args = parser.parse_args(argv)
+
+    names = [n[len("bench_"):] for n in dir(Benchmarks) if n.startswith("bench_")]
+    if args.only:
+        selected = args.only.split(",")
+        names = [n for n in names if any(n.startswith(s) for s in selected)]
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {r["name"]: r for r in json.load(f)["results"]}
+
+    folder = args.data or tempfile.mkdtemp(prefix="deepracer-bench-")
+    os.makedirs(folder, exist_ok=True)
+    results = []
+
+    try:
+        print("Generating %s data in %s" % (args.scale, folder))
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            benchmarks = Benchmarks(folder, SCALES[args.scale])
+
+        print("%-20s %10s %10s %14s %10s %10s" % (
+            "benchmark", "rows", "seconds", "rows/s", "peak MB", "vs base"))
+        for name in names:
+            function, rows = getattr(benchmarks, "bench_" + name)()
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                seconds, peak = measure(function, not args.no_memory)
+
+            result = {"name": name, "rows": rows, "seconds": seconds,
+                      "rows_per_second": rows / seconds, "peak_bytes": peak}
+            results.append(result)
+
+            change = ""
+            if name in baseline:
+                change = "%+.0f%%" % ((seconds / baseline[name]["seconds"] - 1) * 100)
+
+            print("%-20s %10d %10.3f %14.0f %10s %10s" % (
+                name, rows, seconds, rows / seconds,
+                "-" if peak is None else "%.1f" % (peak / 2 ** 20), change))
+    finally:
+        if not args.data:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"scale": args.scale, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Copyright 2019-2020 AWS DeepRacer Community. All Rights Reserved.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import json
+import os
+
+import numpy as np
+
+SIMTRACE_HEADER = "episode,steps,x,y,heading,steering_angle,speed,action,reward,done," \
+    "all_wheels_on_track,progress,closest_waypoint,track_len,tstamp,episode_status," \
+    "pause_duration\n"
+
+SIM_TRACE_FORMAT = "%d,%d,%.4f,%.4f,%.4f,%.2f,%.2f,%d,%.4f,%s,%s,%.4f,%d,%.2f,%.4f,%s,%.2f"
+
+HYPERPARAMETERS = {
+    "batch_size": 64,
+    "beta_entropy": 0.01,
+    "discount_factor": 0.999,
+    "e_greedy_value": 0.05,
+    "epsilon_steps": 10000,
+    "exploration_type": "categorical",
+    "loss_type": "huber",
+    "lr": 0.0003,
+    "num_episodes_between_training": 20,
+    "num_epochs": 10,
+    "stack_size": 1,
+    "term_cond_avg_score": 350.0,
+    "term_cond_max_episodes": 1000
+}
+
+ACTION_SPACE = [
+    {"steering_angle": steering, "speed": speed, "index": i * 3 + j}
+    for i, steering in enumerate([-30.0, 0.0, 30.0])
+    for j, speed in enumerate([1.0, 2.0, 3.0])
+]
+
+
+def make_track(waypoints=120, radius_x=6.0, radius_y=3.5, width=1.07):
+    """Oval track in the format of the npy track files
+
+    Returns:
+    Numpy array of [center_x, center_y, inner_x, inner_y, outer_x, outer_y] rows,
+    with the first waypoint repeated at the end
+    """
+    angles = np.linspace(0, 2 * np.pi, waypoints, endpoint=False)
+    angles = np.append(angles, angles[0])
+
+    def ellipse(offset):
+        return np.column_stack((
+            (radius_x + offset) * np.cos(angles), (radius_y + offset) * np.sin(angles)))
+
+    return np.hstack((ellipse(0), ellipse(-width / 2), ellipse(width / 2)))
+
+
+def make_steps(episodes, steps_per_episode=150, waypoints=None, seed=0, start_episode=0,
+               tstamp=1600000000.0):
+    """Generates simulation steps driving around the track
+
+    Arguments:
+    episodes - number of episodes
+    steps_per_episode - average number of steps in an episode
+    waypoints - track waypoints, default: make_track()
+    seed - random seed, the same seed always gives the same data
+    start_episode - number of the first episode
+    tstamp - timestamp of the first step
+
+    Returns:
+    Dictionary of numpy arrays with one entry per column of the simtrace files
+    """
+    if waypoints is None:
+        waypoints = make_track()
+
+    rng = np.random.RandomState(seed)
+    center = waypoints[:-1, 0:2]
+    n_waypoints = center.shape[0]
+
+    lengths = rng.randint(steps_per_episode // 2, steps_per_episode * 3 // 2 + 1, episodes)
+    episode = np.repeat(np.arange(start_episode, start_episode + episodes), lengths)
+    first_step = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    steps = np.arange(episode.shape[0]) - first_step + 1
+    rows = episode.shape[0]
+
+    start_at = np.repeat(rng.randint(0, n_waypoints, episodes), lengths)
+    speed_factor = np.repeat(rng.uniform(0.5, 1.0, episodes), lengths)
+    position = start_at + steps * speed_factor * n_waypoints / steps_per_episode
+    closest_waypoint = np.floor(position).astype(int) % n_waypoints
+
+    offset = rng.normal(0, 0.15, (rows, 2))
+    x = center[closest_waypoint, 0] + offset[:, 0]
+    y = center[closest_waypoint, 1] + offset[:, 1]
+
+    action = rng.randint(0, len(ACTION_SPACE), rows)
+    steering_angle = np.array([a["steering_angle"] for a in ACTION_SPACE])[action]
+    speed = np.array([a["speed"] for a in ACTION_SPACE])[action]
+
+    progress = np.minimum(100.0, steps * speed_factor * 100.0 / steps_per_episode)
+    is_last = np.append(episode[1:] != episode[:-1], True)
+    episode_status = np.where(
+        is_last, np.where(progress >= 100.0, "lap_complete", "off_track"), "in_progress")
+
+    return {
+        "episode": episode,
+        "steps": steps,
+        "x": x,
+        "y": y,
+        "heading": rng.uniform(-180, 180, rows),
+        "steering_angle": steering_angle,
+        "speed": speed,
+        "action": action,
+        "reward": rng.uniform(0, 2, rows),
+        "done": np.where(is_last, "True", "False"),
+        "all_wheels_on_track": np.where(rng.uniform(0, 1, rows) < 0.9, "True", "False"),
+        "progress": progress,
+        "closest_waypoint": closest_waypoint,
+        "track_len": np.full(rows, 17.71),
+        "tstamp": tstamp + np.arange(rows) / 15.0,
+        "episode_status": episode_status,
+        "pause_duration": np.zeros(rows),
+    }
+
+
+def _format_lines(steps):
+    columns = [steps[c] for c in SIMTRACE_HEADER.strip().split(",")]
+    return [SIM_TRACE_FORMAT % row for row in zip(*columns)]
+
+
+def write_robomaker_log(path, episodes, steps_per_episode=150, seed=0, waypoints=None):
+    """Writes a RoboMaker log with hyperparameters, action space and SIM_TRACE_LOG lines
+
+    Returns:
+    Number of SIM_TRACE_LOG lines written
+    """
+    steps = make_steps(episodes, steps_per_episode, waypoints, seed)
+    lines = _format_lines(steps)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(" * /WORLD_NAME: synthetic_oval\n")
+        f.write("Using the following hyper-parameters\n")
+        f.write(json.dumps(HYPERPARAMETERS, indent=2) + "\n")
+        f.write("Loaded action space from file: %s\n" % json.dumps(ACTION_SPACE))
+        f.write("Sensor list ['FRONT_FACING_CAMERA'], network DEEP_CONVOLUTIONAL_NETWORK_SHALLOW, "
+                "simapp_version 3.0\n")
+        # two dummy lines are skipped by SimulationLogsIO.convert_to_pandas
+        for line in lines[:2] + lines:
+            f.write("SIM_TRACE_LOG:%s\t\n" % line)
+            f.write("some other log line\n")
+
+    return len(lines)
+
+
+def write_simtrace_folder(model_folder, layout="drfc-single", iterations=10,
+                          episodes_per_iteration=20, workers=1, steps_per_episode=150,
+                          seed=0, waypoints=None):
+    """Writes a model folder with simtrace CSV files in one of the layouts DeepRacerLog reads
+
+    Arguments:
+    model_folder - folder to create
+    layout - 'console' (sim-trace/training/training-simtrace with a RoboMaker log),
+        'drfc-single' (training-simtrace) or 'drfc-multi' (<worker>/training-simtrace)
+    iterations - number of iteration files per worker
+    episodes_per_iteration - episodes in each iteration file
+    workers - number of workers, used by the 'drfc-multi' layout
+    steps_per_episode - average number of steps in an episode
+    seed - random seed
+
+    Returns:
+    Number of steps written
+    """
+    if layout == "console":
+        folders = [os.path.join(model_folder, "sim-trace", "training", "training-simtrace")]
+        write_robomaker_log(
+            os.path.join(model_folder, "logs", "training", "synthetic-robomaker.log"),
+            2, steps_per_episode, seed, waypoints)
+    elif layout == "drfc-single":
+        folders = [os.path.join(model_folder, "training-simtrace")]
+    elif layout == "drfc-multi":
+        folders = [os.path.join(model_folder, str(w), "training-simtrace")
+                   for w in range(workers)]
+    else:
+        raise Exception("Unknown layout: %s" % layout)
+
+    rows = 0
+    for w, folder in enumerate(folders):
+        os.makedirs(folder, exist_ok=True)
+        for i in range(iterations):
+            steps = make_steps(episodes_per_iteration, steps_per_episode, waypoints,
+                               seed=seed + w * 100003 + i, start_episode=0,
+                               tstamp=1600000000.0 + i * 3600 + w)
+            lines = _format_lines(steps)
+            with open(os.path.join(folder, "%d-iteration.csv" % i), "w") as f:
+                f.write(SIMTRACE_HEADER)
+                f.write("\n".join(lines))
+                f.write("\n")
+            rows += len(lines)
+
+    return rows
+
+
+REWARD_MODULE = '''
+class Reward:
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+
+    def reward_function(self, params):
+        reward = 1.0
+        if params["distance_from_center"] > params["track_width"] / 4:
+            reward *= 0.5
+        return float(reward * params["speed"])
+'''
+
+
+def write_reward_module(folder, name="synthetic_reward"):
+    """Writes a reward module usable with NewRewardUtils.new_reward
+
+    Returns:
+    Name of the module, importable once folder is on sys.path
+    """
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, "%s.py" % name), "w") as f:
+        f.write(REWARD_MODULE)
+
+    return name
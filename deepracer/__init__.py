@@ -1,5 +1,25 @@
-from . import logs, tracks, boto3_enhancer
+import importlib
+import sys
 
 from ._version import get_versions
 __version__ = get_versions()['version']
 del get_versions
+
+# Subpackages are imported on first access (PEP 562) so that e.g. the CLI does not pay
+# for importing pandas and friends.
+_SUBPACKAGES = ["boto3_enhancer", "logs", "tracks"]
+
+
+def __getattr__(name):
+    if name in _SUBPACKAGES:
+        return importlib.import_module("." + name, __name__)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + _SUBPACKAGES)
+
+
+if sys.version_info < (3, 7):
+    # module __getattr__ is not supported before Python 3.7
+    from . import boto3_enhancer, logs, tracks  # noqa: F401
@@ -17,7 +17,6 @@ SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
 import os
-import boto3
 import shutil
 
 from deepracer.utils import DEEPRACER_UTILS_ROOT
@@ -43,6 +42,8 @@ def add_deepracer(session=None, **kwargs):
     This code has been written thanks to guidance of Don Barber of AWS. The model
     file for deepracer is his doing and has been introduced in
     """
+    import boto3
+
     if not session:
         if not boto3.DEFAULT_SESSION:
             boto3.setup_default_session(**kwargs)
@@ -56,6 +57,8 @@ def deepracer_client(region_name='us-east-1'):
     """
     Return deepracer client for boto3 with default (and only working) parameters
     """
+    import boto3
+
     add_deepracer()
 
     return boto3.client('deepracer', region_name=region_name)
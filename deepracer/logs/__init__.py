@@ -1,4 +1,11 @@
-from .log_utils import ActionBreakdownUtils, AnalysisUtils, EvaluationUtils, NewRewardUtils, \
-    PlottingUtils, SimulationLogsIO
+from .downsampling import DownsamplingUtils
+from .instrumentation import Instrumentation
+from .log_utils import ActionBreakdownUtils, AnalysisUtils, EpisodeAggregates, EvaluationUtils, \
+    NewRewardUtils, PlottingUtils, SimulationLogsIO
 from .load_metrics import TrainingMetrics
 from .log import DeepRacerLog
+from .render import BatchRenderer, FigureCapture
+from .replay import EpisodeReplay
+from .report import TrainingReport
+from .storage import LocalStorage, S3Storage, Storage
+from .stream_statistics import QuantileSketch, RollingStatistics, StreamingStatistics
@@ -0,0 +1,191 @@
+"""
+Copyright 2019-2020 AWS DeepRacer Community. All Rights Reserved.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import numpy as np
+
+
+class DownsamplingUtils:
+    """Reduces the number of points handed to matplotlib so that plots of millions of steps
+    stay fast and readable.
+
+    Trajectories are decimated with Largest-Triangle-Three-Buckets (LTTB), which keeps
+    the points shaping the path, such as corners, and drops the ones along straight
+    stretches. Dense clouds of points are summarised by a 2D density histogram.
+    """
+
+    @staticmethod
+    def lttb(x, y, n_out):
+        """Select points of a trajectory with Largest-Triangle-Three-Buckets
+
+        The points are split into n_out - 2 buckets in their order. Of each bucket
+        the point forming the largest triangle with the point selected in the previous
+        bucket and the mean of the next bucket is kept. First and last points are always
+        kept. Areas are measured in the x, y plane, so it works for paths on the track.
+
+        Arguments:
+        x - array of x coordinates, in the order of the trajectory
+        y - array of y coordinates
+        n_out - number of points to select
+
+        Returns:
+        Sorted array of indices of the selected points
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        n = x.shape[0]
+        if n_out >= n:
+            return np.arange(n)
+        if n_out < 3:
+            return np.array([0, n - 1][:max(n_out, 0)], dtype=int)
+
+        edges = (np.arange(n_out - 1) * (n - 2) / (n_out - 2)).astype(int) + 1
+        edges[-1] = n - 1
+
+        selected = np.empty(n_out, dtype=int)
+        selected[0] = 0
+        selected[-1] = n - 1
+        a = 0
+        for i in range(n_out - 2):
+            start, end = edges[i], edges[i + 1]
+            next_end = edges[i + 2] if i + 2 < n_out - 1 else n
+            next_x = x[end:next_end].mean()
+            next_y = y[end:next_end].mean()
+
+            area = np.abs((x[a] - next_x) * (y[start:end] - y[a])
+                          - (x[a] - x[start:end]) * (next_y - y[a]))
+            a = start + int(np.argmax(area))
+            selected[i + 1] = a
+
+        return selected
+
+    @staticmethod
+    def lttb_frame(df, max_points, group='episode', x='x', y='y'):
+        """Decimate the trajectories of a dataframe to about max_points rows in total
+
+        Each group (episode by default) gets a share of max_points proportional to its
+        number of rows and is decimated with LTTB. Groups whose share is below 3 get 3
+        points while max_points allows it, otherwise they keep only their end points or
+        are left out, so the result never has more than max_points rows. Rows keep their
+        order and all their columns, so selected points can be coloured by any value.
+
+        Arguments:
+        df - dataframe with steps, rows of each group in the order of the trajectory
+        max_points - target number of rows
+        group - column identifying separate trajectories, default: episode. If None or
+            not in df, all rows are one trajectory
+        x - column with x coordinates, default: x
+        y - column with y coordinates, default: y
+
+        Returns:
+        The dataframe if it has no more than max_points rows, otherwise the selected rows
+        """
+        n = df.shape[0]
+        if max_points is None or n <= max_points:
+            return df
+
+        if group is None or group not in df.columns:
+            positions = [np.arange(n)]
+        else:
+            positions = list(df.groupby(group, sort=False).indices.values())
+
+        xs = df[x].to_numpy()
+        ys = df[y].to_numpy()
+
+        sizes = np.array([p.shape[0] for p in positions])
+        budgets = DownsamplingUtils._shares(sizes, max_points)
+
+        # short groups get the 3 points of a bent line, if all of them can have them
+        short = budgets < 3
+        needed = np.minimum(sizes[short], 3)
+        if short.any() and needed.sum() <= max_points:
+            budgets[short] = needed
+            budgets[~short] = DownsamplingUtils._shares(sizes[~short], max_points - needed.sum())
+        budgets = np.minimum(budgets, sizes)
+
+        selected = [np.empty(0, dtype=int)]
+        for p, budget in zip(positions, budgets):
+            selected.append(p[DownsamplingUtils.lttb(xs[p], ys[p], budget)])
+
+        return df.take(np.sort(np.concatenate(selected)))
+
+    @staticmethod
+    def _shares(weights, total):
+        """Splits total into integers proportional to weights, adding up to total
+
+        Shares are rounded down and the points left go to the largest remainders.
+        """
+        if weights.shape[0] == 0:
+            return weights.copy()
+
+        exact = total * weights / weights.sum()
+        shares = np.floor(exact).astype(int)
+        shares[np.argsort(shares - exact, kind='stable')[:total - shares.sum()]] += 1
+        return shares
+
+    @staticmethod
+    def density(x, y, bins=200, extent=None, weights=None):
+        """2D histogram of points, to draw instead of the points themselves
+
+        Arguments:
+        x - array of x coordinates
+        y - array of y coordinates
+        bins - number of bins along the longer side of the extent, default: 200
+        extent - area to cover as (xmin, xmax, ymin, ymax), default: None (bounds
+            of the points)
+        weights - weights of the points, default: None (count points)
+
+        Returns:
+        A tuple of (image indexed by [y bin, x bin], extent), ready for
+        imshow(image, extent=extent, origin='lower')
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        finite = np.isfinite(x) & np.isfinite(y)
+        x, y = x[finite], y[finite]
+        if weights is not None:
+            weights = np.asarray(weights, dtype=float)[finite]
+
+        if extent is None:
+            extent = (np.nanmin(x), np.nanmax(x), np.nanmin(y), np.nanmax(y))
+
+        width = max(extent[1] - extent[0], 1e-9)
+        height = max(extent[3] - extent[2], 1e-9)
+        scale = bins / max(width, height)
+        shape = (max(1, int(np.ceil(height * scale))), max(1, int(np.ceil(width * scale))))
+
+        image, _, _ = np.histogram2d(
+            y, x, bins=shape, range=[extent[2:4], extent[0:2]], weights=weights)
+
+        return image, tuple(extent)
+
+    @staticmethod
+    def plot_density(ax, x, y, bins=200, extent=None, weights=None, cmap='Blues', **kwargs):
+        """Draw a 2D histogram of points, leaving empty bins transparent
+
+        Arguments:
+        ax - axes to draw on
+        x, y, bins, extent, weights - as in DownsamplingUtils.density
+        cmap - colour map, default: Blues
+        kwargs - other arguments passed to imshow
+
+        Returns:
+        The image artist
+        """
+        image, extent = DownsamplingUtils.density(x, y, bins, extent, weights)
+
+        return ax.imshow(np.ma.masked_equal(image, 0), extent=extent, origin='lower',
+                         cmap=cmap, interpolation='nearest', **kwargs)
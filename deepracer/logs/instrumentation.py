@@ -0,0 +1,351 @@
+"""
+Copyright 2019-2020 AWS DeepRacer Community. All Rights Reserved.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from contextlib import contextmanager
+import functools
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+REPORT_COLUMNS = ["name", "parent", "depth", "thread", "start", "duration", "rows",
+                  "bytes_read", "memory_peak", "error"]
+
+
+class Span:
+    """A named section of work, timed and recorded while instrumentation is enabled.
+
+    Use it through Instrumentation.span as a context manager. Rows processed and bytes read
+    can be reported with add().
+    """
+
+    def __init__(self, name, rows=None, bytes_read=None):
+        self.name = name
+        self.rows = rows
+        self.bytes_read = bytes_read
+
+        self.parent = None
+        self.depth = 0
+        self.start = None
+        self.duration = None
+        self.memory_peak = None
+
+        self._started = None
+        self._memory_start = None
+        self._memory_high = None
+
+    def add(self, rows=None, bytes_read=None):
+        """Adds to the rows processed and bytes read in this span
+
+        Arguments:
+        rows - number of rows processed
+        bytes_read - number of bytes read
+        """
+        if rows is not None:
+            self.rows = (self.rows or 0) + rows
+        if bytes_read is not None:
+            self.bytes_read = (self.bytes_read or 0) + bytes_read
+
+    def __enter__(self):
+        Instrumentation._enter(self)
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        Instrumentation._exit(self, error_type)
+        return False
+
+
+class _DisabledSpan:
+    """Stand-in returned while instrumentation is disabled, does nothing
+    """
+
+    def add(self, rows=None, bytes_read=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        return False
+
+
+_DISABLED_SPAN = _DisabledSpan()
+
+
+class Instrumentation:
+    """Opt-in timing and profiling of loading, analysis and plotting.
+
+    Loaders and analyses of deepracer.logs record named spans with wall time, rows processed,
+    bytes read and, if requested, peak memory allocated while the span was open. Spans nest,
+    e.g. DeepRacerLog.load contains discovery, parsing, concatenation and sorting.
+    While disabled, which is the default, instrumented code only checks a flag.
+
+    Example:
+    Instrumentation.enable(trace_memory=True)
+    log.load()
+    AnalysisUtils.simulation_agg(log.dataframe())
+    Instrumentation.report(summary=True)
+    """
+
+    enabled = False
+    trace_memory = False
+
+    _records = []
+    _callbacks = []
+    _lock = threading.Lock()
+    _local = threading.local()
+    _started_tracemalloc = False
+
+    @staticmethod
+    def enable(trace_memory=False, callback=None):
+        """Starts recording spans
+
+        Arguments:
+        trace_memory - record the peak memory allocated in each span using tracemalloc.
+            Slows down the instrumented code noticeably. Default: False
+        callback - function called with a dictionary describing every finished span,
+            see add_callback. Default: None
+        """
+        if callback is not None:
+            Instrumentation.add_callback(callback)
+
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            Instrumentation._started_tracemalloc = True
+
+        Instrumentation.trace_memory = trace_memory
+        Instrumentation.enabled = True
+
+    @staticmethod
+    def disable():
+        """Stops recording spans, recorded ones are kept until reset()
+        """
+        Instrumentation.enabled = False
+        Instrumentation.trace_memory = False
+
+        if Instrumentation._started_tracemalloc:
+            tracemalloc.stop()
+            Instrumentation._started_tracemalloc = False
+
+    @staticmethod
+    @contextmanager
+    def session(trace_memory=False, callback=None):
+        """Context manager recording spans only within its block
+
+        Arguments:
+        trace_memory - record peak memory of spans, see enable(). Default: False
+        callback - function called with every finished span, removed when the block ends.
+            Default: None
+        """
+        Instrumentation.enable(trace_memory, callback)
+        try:
+            yield Instrumentation
+        finally:
+            Instrumentation.disable()
+            if callback is not None:
+                Instrumentation.remove_callback(callback)
+
+    @staticmethod
+    def add_callback(callback):
+        """Registers a function called with every finished span, e.g. to export spans
+        to a monitoring system
+
+        The function receives a dictionary with the keys of the report columns: name, parent,
+        depth, thread, start (epoch seconds), duration (seconds), rows, bytes_read,
+        memory_peak (bytes) and error (exception class name or None).
+        """
+        with Instrumentation._lock:
+            Instrumentation._callbacks.append(callback)
+
+    @staticmethod
+    def remove_callback(callback):
+        """Unregisters a function registered with add_callback
+        """
+        with Instrumentation._lock:
+            if callback in Instrumentation._callbacks:
+                Instrumentation._callbacks.remove(callback)
+
+    @staticmethod
+    def span(name, rows=None, bytes_read=None):
+        """Creates a span to be used as a context manager
+
+        Arguments:
+        name - name of the span
+        rows - number of rows processed, can also be added later with span.add()
+        bytes_read - number of bytes read, can also be added later with span.add()
+
+        Returns:
+        A Span while instrumentation is enabled, otherwise an object doing nothing
+        """
+        if not Instrumentation.enabled:
+            return _DISABLED_SPAN
+        return Span(name, rows, bytes_read)
+
+    @staticmethod
+    def records():
+        """Spans recorded so far
+
+        Returns:
+        A list of dictionaries, one per span, in the order they finished
+        """
+        with Instrumentation._lock:
+            return list(Instrumentation._records)
+
+    @staticmethod
+    def report(summary=False):
+        """Spans recorded so far as a dataframe
+
+        Arguments:
+        summary - if True, spans are grouped by name with count, total and mean duration,
+            total rows and bytes read, rows per second and the highest memory peak.
+            Default: False
+
+        Returns:
+        A dataframe with one row per span, in the order they started, or one row per span
+        name if summary is True
+        """
+        df = pd.DataFrame(Instrumentation.records(), columns=REPORT_COLUMNS)
+        if not summary:
+            return df.sort_values("start", kind="mergesort").reset_index(drop=True)
+
+        grouped = df.groupby("name", sort=False)
+        result = grouped.agg(
+            count=("duration", "size"),
+            duration=("duration", "sum"),
+            mean_duration=("duration", "mean"),
+            memory_peak=("memory_peak", "max"),
+        )
+        # spans not reporting rows or bytes are summed to NaN rather than 0
+        result["rows"] = grouped["rows"].sum(min_count=1)
+        result["bytes_read"] = grouped["bytes_read"].sum(min_count=1)
+        result["rows_per_second"] = result["rows"] / result["duration"]
+
+        return result.sort_values("duration", ascending=False)
+
+    @staticmethod
+    def reset():
+        """Forgets recorded spans
+        """
+        with Instrumentation._lock:
+            Instrumentation._records = []
+
+    @staticmethod
+    def _stack():
+        stack = getattr(Instrumentation._local, "stack", None)
+        if stack is None:
+            stack = Instrumentation._local.stack = []
+        return stack
+
+    @staticmethod
+    def _update_memory(stack):
+        # the tracemalloc peak is global, so before it is reset it is passed on
+        # to all spans open in this thread
+        current, peak = tracemalloc.get_traced_memory()
+        for span in stack:
+            if span._memory_high is not None:
+                span._memory_high = max(span._memory_high, peak)
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        return current
+
+    @staticmethod
+    def _enter(span):
+        stack = Instrumentation._stack()
+        if stack:
+            span.parent = stack[-1].name
+            span.depth = len(stack)
+
+        if Instrumentation.trace_memory and tracemalloc.is_tracing():
+            current = Instrumentation._update_memory(stack)
+            span._memory_start = span._memory_high = current
+
+        stack.append(span)
+        span.start = time.time()
+        span._started = time.perf_counter()
+
+    @staticmethod
+    def _exit(span, error_type):
+        span.duration = time.perf_counter() - span._started
+
+        stack = Instrumentation._stack()
+        if span._memory_start is not None and tracemalloc.is_tracing():
+            Instrumentation._update_memory(stack)
+            span.memory_peak = span._memory_high - span._memory_start
+        if stack and stack[-1] is span:
+            stack.pop()
+
+        record = {
+            "name": span.name,
+            "parent": span.parent,
+            "depth": span.depth,
+            "thread": threading.current_thread().name,
+            "start": span.start,
+            "duration": span.duration,
+            "rows": span.rows,
+            "bytes_read": span.bytes_read,
+            "memory_peak": span.memory_peak,
+            "error": None if error_type is None else error_type.__name__,
+        }
+
+        with Instrumentation._lock:
+            Instrumentation._records.append(record)
+            callbacks = list(Instrumentation._callbacks)
+
+        for callback in callbacks:
+            callback(record)
+
+
+def instrument(name=None):
+    """Decorator recording every call of a function as a span
+
+    Rows processed are taken from the first dataframe argument or, if there is none,
+    from the length of the result. While instrumentation is disabled the function
+    is called directly.
+
+    Arguments:
+    name - name of the span. Default: qualified name of the function
+    """
+    def decorator(function):
+        span_name = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not Instrumentation.enabled:
+                return function(*args, **kwargs)
+
+            with Span(span_name) as span:
+                result = function(*args, **kwargs)
+                if span.rows is None:
+                    span.rows = _count_rows(args, kwargs, result)
+
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def _count_rows(args, kwargs, result):
+    for value in list(args) + list(kwargs.values()):
+        if isinstance(value, pd.DataFrame):
+            return value.shape[0]
+
+    if isinstance(result, (pd.DataFrame, pd.Series, list)):
+        return len(result)
+
+    return None
@@ -15,19 +15,21 @@ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-from io import BytesIO
+import itertools
 import json
 import math
+import re
 
-import boto3
 import numpy as np
 import pandas as pd
 
-import matplotlib.pyplot as plt
+from .instrumentation import Instrumentation, instrument
+from .render import show_figure
+from .storage import S3Storage
 
 
 class TrainingMetrics:
-    """ Class used to load in training metrics from S3
+    """ Class used to load in training metrics from S3 or a local copy of the bucket
     """
 
     def __init__(
@@ -40,7 +42,8 @@ class TrainingMetrics:
             training_round=1,
             display_digits_iteration=3,
             display_digits_episode=4,
-            display_digits_round=2
+            display_digits_round=2,
+            storage=None
     ):
         """Creates a TrainingMetrics object. Loads the first metrics file into a DataFrame if
             model name is provided.
@@ -58,44 +61,66 @@ class TrainingMetrics:
             iteration 25 the display_digits_iteration=4 would give unique index as 1-1225)
         s3_endpoint_url - (str) URL for the S3 endpoint
         region - (str) AWS Region for S3
+        storage - (Storage) Backend to read the metrics files from, e.g. LocalStorage for
+            a MinIO data folder mounted on disk. Default: None - S3Storage created with
+            s3_endpoint_url and region.
 
         Returns:
         TrainingMetrics object.
         """
-        self.s3 = boto3.resource("s3", endpoint_url=s3_endpoint_url, region_name=region)
+        if storage is None:
+            storage = S3Storage(s3_endpoint_url=s3_endpoint_url, region=region)
+        self.storage = storage
         self.max_iteration_strlen = display_digits_iteration
         self.max_episode_strlen = display_digits_episode
         self.max_round_strlen = display_digits_round
         self.metrics = None
+        self._summary_cache = {}
         self.bucket = bucket
         self.pattern = pattern
         if model_name is not None:
-            df = self._loadRound(
-                bucket, self.pattern.format(model_name), training_round
-            )
-            self.metrics = df
+            self.addRound(model_name, training_round)
+
+    @property
+    def s3(self):
+        """Deprecated, the boto3 S3 client of the storage backend, None for other backends.
+        Use storage instead.
+        """
+        return getattr(self.storage, "s3", None)
 
     def _loadRound(self, bucket, key, training_round, worker, verbose=False):
+        return self._buildRound(
+            self._fetch(bucket, key, verbose), training_round, worker, self.metrics
+        )
 
+    def _fetch(self, bucket, key, verbose=False):
         if verbose:
-            print("Downloading s3://%s/%s" % (bucket, key))
+            print("Downloading %s" % self.storage.url(bucket, key))
+
+        with Instrumentation.span("TrainingMetrics.fetch") as span:
+            with self.storage.open(bucket, key) as f:
+                raw = f.read()
+            data = json.loads(raw)
 
-        bytes_io = BytesIO()
-        self.s3.Object(bucket, key).download_fileobj(bytes_io)
-        data = json.loads(bytes_io.getvalue())
+            # the records are turned into a frame directly, timestamps are converted
+            # the way pd.read_json used to do it
+            df = pd.DataFrame(data["metrics"])
+            for column in ["metric_time", "start_time"]:
+                if column in df.columns:
+                    df[column] = pd.to_datetime(df[column], unit="ms")
+            span.add(rows=df.shape[0], bytes_read=len(raw))
 
-        df = pd.read_json(json.dumps(data["metrics"]), orient="records")
+        return df
+
+    @instrument()
+    def _buildRound(self, df, training_round, worker, metrics):
         if worker == 0:
             self.episodes_per_iteration = max(df["trial"])
 
         df["round"] = training_round
-        df["iteration"] = (
-            ((df["episode"] - 1) / self.episodes_per_iteration)
-            .apply(np.floor)
-            .astype(int)
-        )
-        if self.metrics is not None:
-            prev_metrics = self.metrics[self.metrics["round"] < training_round]
+        df["iteration"] = (df["episode"] - 1) // self.episodes_per_iteration
+        if metrics is not None:
+            prev_metrics = metrics[metrics["round"] < training_round]
             if prev_metrics.shape[0] > 0:
                 df["master_iteration"] = (
                     max(prev_metrics["master_iteration"]) + 1 + df["iteration"]
@@ -107,27 +132,11 @@ class TrainingMetrics:
         self.max_iteration_strlen = max(
             len(str(max(df["iteration"]))), self.max_iteration_strlen
         )
-        df["r-i"] = (
-            df["round"].astype(str).str.pad(width=self.max_round_strlen, side="left", fillchar="0")
-            + "-"
-            + df["iteration"]
-            .astype(str)
-            .str.pad(width=self.max_iteration_strlen, side="left", fillchar="0")
-        )
-
-        df["r-e"] = (
-            df["round"].astype(str)
-            + "-"
-            + df["episode"]
-            .astype(str)
-            .str.pad(width=self.max_episode_strlen, side="left", fillchar="0")
-        )
+        self._addKeys(df)
         df["worker"] = worker
         df["reward"] = df["reward_score"]
         df["completion"] = df["completion_percentage"]
-        df["complete"] = df["episode_status"].apply(
-            lambda x: 1 if x == "Lap complete" else 0
-        )
+        df["complete"] = (df["episode_status"] == "Lap complete").astype(int)
         df["time"] = df["elapsed_time_in_milliseconds"] / 1000
         print(
             ("Successfully loaded training round %i for worker %i: Iterations: %i, " +
@@ -159,6 +168,189 @@ class TrainingMetrics:
             ]
         ]
 
+    @classmethod
+    @instrument()
+    def load_many(
+            cls,
+            bucket,
+            models,
+            pattern="{}/metrics/TrainingMetrics{}.json",
+            s3_endpoint_url=None,
+            region=None,
+            storage=None,
+            threads=16,
+            **kwargs
+    ):
+        """Loads training metrics of multiple models for comparison.
+
+        All metrics files are fetched concurrently through a single storage backend and
+        combined into one DataFrame with a categorical "model" column. getSummary on the
+        result aggregates all models in one grouping.
+
+        Arguments:
+        bucket - S3 bucket where the metrics files are stored
+        models - (list / dict) List of model names, each loaded as a single round with one
+            worker, or a dictionary mapping the model label to a list of its rounds. Each
+            round is either a model name or a tuple of (model_name, workers).
+        pattern - (str) Filename pattern that will be formatted with the model name and
+            worker suffix to create the key.
+        s3_endpoint_url - (str) URL for the S3 endpoint
+        region - (str) AWS Region for S3
+        storage - (Storage) Backend to read the metrics files from. Default: None - S3Storage
+            created with s3_endpoint_url and region.
+        threads - (int) Number of files fetched in parallel. Default: 16
+        kwargs - remaining arguments passed to the TrainingMetrics constructor
+
+        Returns:
+        TrainingMetrics object.
+        """
+        if storage is None:
+            storage = S3Storage(
+                s3_endpoint_url=s3_endpoint_url, region=region, max_pool_connections=threads
+            )
+
+        tm = cls(bucket, pattern=pattern, storage=storage, **kwargs)
+
+        if type(models) is not dict:
+            models = {m: [m] for m in models}
+
+        layouts = {}
+        for label, rounds in models.items():
+            layouts[label] = [(r, 1) if type(r) is str else tuple(r) for r in rounds]
+
+        from joblib import Parallel, delayed
+
+        jobs = [
+            (label, training_round, w, tm.pattern.format(model_name, "_{}".format(w) if w else ""))
+            for label, rounds in layouts.items()
+            for training_round, (model_name, workers) in enumerate(rounds, 1)
+            for w in range(workers)
+        ]
+
+        fetched = Parallel(n_jobs=threads, prefer="threads")(
+            delayed(tm._fetch)(bucket, key) for (_, _, _, key) in jobs
+        )
+
+        dfs = []
+        model_label = None
+        for (label, training_round, w, _), df in zip(jobs, fetched):
+            if label != model_label:
+                model_label = label
+                model_metrics = None
+            df = tm._buildRound(df, training_round, w, model_metrics)
+            df.insert(0, "model", label)
+            model_metrics = df if model_metrics is None else pd.concat([model_metrics, df])
+            dfs.append(df)
+
+        if dfs:
+            tm.metrics = pd.concat(dfs, ignore_index=True)
+            tm.metrics["model"] = pd.Categorical(tm.metrics["model"], categories=list(layouts))
+            tm._addKeys(tm.metrics)
+
+        return tm
+
+    @staticmethod
+    @instrument()
+    def discover(
+            bucket,
+            prefix="",
+            pattern="{}/metrics/TrainingMetrics{}.json",
+            storage=None
+    ):
+        """Finds metrics files of all models under a prefix with a single listing.
+
+        Keys are matched against the pattern to get the model name and the worker number.
+        Empty files are skipped, workers are counted from 0 up to the first missing file.
+
+        Arguments:
+        bucket - S3 bucket where the metrics files are stored
+        prefix - (str) Prefix to list. Default: "" (whole bucket)
+        pattern - (str) Filename pattern used to store the metrics files, with a {} for
+            the model name and one for the worker suffix.
+        storage - (Storage) Backend to list the files with. Default: None - S3Storage.
+
+        Returns:
+        Dictionary mapping the model name to its number of workers, usable as the input of
+        load_many.
+        """
+        if pattern.count("{}") != 2:
+            raise ValueError(
+                "Pattern %s must contain two {} placeholders, for the model name and the"
+                " worker suffix, e.g. {}/metrics/TrainingMetrics{}.json" % pattern)
+
+        if storage is None:
+            storage = S3Storage()
+
+        head, middle, tail = pattern.split("{}")
+        key_regex = re.compile(
+            "^%s(?P<model>.+?)%s(?:_(?P<worker>\\d+))?%s$"
+            % (re.escape(head), re.escape(middle), re.escape(tail))
+        )
+
+        found = {}
+        for key, size in storage.list(bucket, prefix):
+            m = key_regex.match(key)
+            if m is None or size == 0:
+                continue
+            found.setdefault(m.group("model"), set()).add(int(m.group("worker") or 0))
+
+        models = {}
+        for model_name in sorted(found):
+            workers = 0
+            while workers in found[model_name]:
+                workers += 1
+            if workers > 0:
+                models[model_name] = workers
+
+        return models
+
+    @classmethod
+    def load_prefix(
+            cls,
+            bucket,
+            prefix="",
+            pattern="{}/metrics/TrainingMetrics{}.json",
+            s3_endpoint_url=None,
+            region=None,
+            storage=None,
+            threads=16,
+            **kwargs
+    ):
+        """Loads training metrics of all models found under a prefix.
+
+        Each model found is loaded as a single round with all of its workers.
+
+        Arguments:
+        bucket - S3 bucket where the metrics files are stored
+        prefix - (str) Prefix to list. Default: "" (whole bucket)
+        pattern - (str) Filename pattern used to store the metrics files.
+        s3_endpoint_url - (str) URL for the S3 endpoint
+        region - (str) AWS Region for S3
+        storage - (Storage) Backend to read the metrics files from. Default: None - S3Storage
+            created with s3_endpoint_url and region.
+        threads - (int) Number of files fetched in parallel. Default: 16
+        kwargs - remaining arguments passed to the TrainingMetrics constructor
+
+        Returns:
+        TrainingMetrics object.
+        """
+        if storage is None:
+            storage = S3Storage(
+                s3_endpoint_url=s3_endpoint_url, region=region, max_pool_connections=threads
+            )
+
+        models = TrainingMetrics.discover(bucket, prefix, pattern, storage)
+
+        return cls.load_many(
+            bucket,
+            {model_name: [(model_name, workers)] for model_name, workers in models.items()},
+            pattern=pattern,
+            storage=storage,
+            threads=threads,
+            **kwargs
+        )
+
+    @instrument()
     def addRound(self, model_name, training_round=2, workers=1):
         """Adds a round of training metrics to the data set
 
@@ -179,10 +371,37 @@ class TrainingMetrics:
             )
 
             if self.metrics is not None:
-                self.metrics = self.metrics.append(df, ignore_index=True)
+                self.metrics = pd.concat([self.metrics, df], ignore_index=True)
+                self._addKeys(self.metrics)
             else:
                 self.metrics = df
 
+        self._summary_cache.clear()
+
+    def _addKeys(self, df):
+        """Adds the "r-i" and "r-e" keys to the DataFrame.
+
+        Keys are stored as categoricals built from the integer round, iteration and
+        episode columns, so the zero-padded labels are only formatted once per unique
+        value instead of once per row.
+        """
+        df["r-i"] = TrainingMetrics._categoricalKey(
+            df["round"], df["iteration"], self.max_round_strlen, self.max_iteration_strlen
+        )
+        df["r-e"] = TrainingMetrics._categoricalKey(
+            df["round"], df["episode"], 0, self.max_episode_strlen
+        )
+
+    @staticmethod
+    def _categoricalKey(major, minor, major_digits, minor_digits):
+        keys = (major.values.astype(np.int64) << 32) | minor.values.astype(np.int64)
+        codes, uniques = pd.factorize(keys, sort=True)
+        labels = [
+            "%s-%s" % (str(k >> 32).zfill(major_digits), str(k & 0xFFFFFFFF).zfill(minor_digits))
+            for k in uniques
+        ]
+        return pd.Categorical.from_codes(codes, labels)
+
     def getEvaluation(self):
         """Get the Evaluation part of the data.
 
@@ -199,52 +418,77 @@ class TrainingMetrics:
         """
         return self.metrics[self.metrics["phase"] == "training"]
 
-    def getSummary(self, rounds=None, method="mean", summary_index=["r-i", "iteration"]):
+    def getSummary(self, rounds=None, method="mean", summary_index=None):
         """Provides summary per iteration. Data for evaluation and training is separated.
 
+        All requested statistics are calculated in a single grouping over the summary index
+        and the phase. Results are cached until another round is added.
+
         Arguments:
-        method - (str) Statistical value to be calculated. Examples are 'mean', 'median',
-            'min' & 'max'. Default: 'mean'.
+        rounds - (list) Rounds to be included in the summary. Default: None (all rounds).
+        method - (str / list) Statistical value to be calculated. Examples are 'mean',
+            'median', 'min' & 'max'. Default: 'mean'.
         summary_index - (list) List of columns to be used as index of summary.
-            Default ['r-i','iteration'].
+            Default ['r-i','iteration'], preceded by 'model' for metrics of multiple models.
 
         Returns:
-        Pandas DataFrame containing the summary table.
+        Pandas DataFrame containing the summary table. If a list of methods is provided,
+        columns are prefixed with an extra level holding the method name.
         """
-        input_df = self.metrics
-        if rounds is not None:
-            input_df = input_df[input_df["round"].isin(rounds)]
+        if summary_index is None:
+            summary_index = ["r-i", "iteration"]
+            if "model" in self.metrics.columns:
+                summary_index = ["model"] + summary_index
+
+        methods = method if type(method) is list else [method]
+        cache_key = (
+            tuple(rounds) if rounds is not None else None,
+            tuple(methods),
+            tuple(summary_index),
+        )
 
-        columns = summary_index + ["reward", "completion", "time", "complete"]
-        training_input = input_df[input_df["phase"] == "training"][columns].copy()
-        eval_input = input_df[input_df["phase"] == "evaluation"][columns].copy()
-
-        training_gb = training_input.groupby(summary_index)
-        training_agg = getattr(training_gb, method)()
-        training_agg.columns = [
-            "train_reward",
-            "train_completion",
-            "train_time",
-            "train_completed",
-        ]
+        if cache_key not in self._summary_cache:
+            self._summary_cache[cache_key] = self._summarize(rounds, methods, summary_index)
+
+        summaries = self._summary_cache[cache_key]
+        if type(method) is not list:
+            return summaries[method].copy()
 
-        training_cnt = training_gb.count()
-        training_agg['train_episodes'] = training_cnt['complete']
+        return pd.concat(summaries, axis=1, sort=False)
 
-        eval_gb = eval_input.groupby(summary_index)
-        eval_agg = getattr(eval_gb, method)()
-        eval_agg.columns = [
-            "eval_reward",
-            "eval_completion",
-            "eval_time",
-            "eval_completed",
-        ]
+    @instrument("TrainingMetrics.summarize")
+    def _summarize(self, rounds, methods, summary_index):
+        input_df = self.metrics
+        if rounds is not None:
+            input_df = input_df[input_df["round"].isin(rounds)]
 
-        eval_cnt = eval_gb.count()
-        eval_agg['eval_episodes'] = eval_cnt['complete']
+        columns = ["reward", "completion", "time", "complete"]
+        aggregations = {c: list(methods) for c in columns}
+        aggregations["complete"] = list(methods) + ["count"]
 
-        return pd.concat([training_agg, eval_agg], axis=1, sort=False)
+        grouped = input_df.groupby(summary_index + ["phase"], observed=True)[columns]
+        phased = grouped.agg(aggregations).unstack("phase")
 
+        summaries = {}
+        for m in methods:
+            parts = []
+            for prefix, phase in [("train", "training"), ("eval", "evaluation")]:
+                part = phased.reindex(
+                    columns=[(c, m, phase) for c in columns] + [("complete", "count", phase)]
+                )
+                part.columns = [
+                    "%s_reward" % prefix,
+                    "%s_completion" % prefix,
+                    "%s_time" % prefix,
+                    "%s_completed" % prefix,
+                    "%s_episodes" % prefix,
+                ]
+                parts.append(part)
+            summaries[m] = pd.concat(parts, axis=1, sort=False)
+
+        return summaries
+
+    @instrument()
     def plotProgress(
             self,
             method="mean",
@@ -258,6 +502,8 @@ class TrainingMetrics:
     ):
         """Plots training progress. Allows selection of multiple iterations.
 
+        Metrics of several models, loaded with load_many, are plotted as a line per model.
+
         Arguments:
         method - (str / list) Statistical value to be calculated. Examples are 'mean', 'median',
             'min' & 'max'. Default: 'mean'.
@@ -271,6 +517,7 @@ class TrainingMetrics:
         Returns:
         Pandas DataFrame containing the summary table.
         """
+        import matplotlib.pyplot as plt
 
         plot_methods = []
         if type(method) is not list:
@@ -286,24 +533,34 @@ class TrainingMetrics:
         else:
             axarr = axarr_raw
 
+        summaries = self.getSummary(method=plot_methods, rounds=rounds)
+
         for (m, ax) in zip(plot_methods, axarr):
-            summary = self.getSummary(method=m, rounds=rounds)
-            labels = max(math.floor(summary.shape[0] / (15 / len(plot_methods))), 1)
-            x = []
-            t = []
-            for i, a in enumerate(summary.index):
-                x.append(a[0])
-                if i % labels == 0:
-                    t.append(a[0])
-
-            for s in series:
-                ax.scatter(x, summary[s[0]], s=2, alpha=0.5, color=s[2])
-                ax.plot(
-                    x,
-                    summary[s[0]].rolling(rolling_average, min_periods=1).mean(),
-                    label=s[1],
-                    color=s[2],
-                )
+            summary = summaries[m]
+
+            # models loaded with load_many are drawn as separate lines over the same
+            # round-iteration axis
+            if "model" in summary.index.names:
+                models = summary.index.get_level_values("model").unique()
+                parts = [(model, summary.xs(model, level="model")) for model in models]
+            else:
+                parts = [(None, summary)]
+
+            iterations = pd.unique(summary.index.get_level_values("r-i"))
+            labels = max(math.floor(len(iterations) / (15 / len(plot_methods))), 1)
+            t = list(iterations[::labels])
+
+            for (model, part), dashes in zip(parts, itertools.cycle(["-", "--", ":", "-."])):
+                x = list(part.index.get_level_values("r-i"))
+                for s in series:
+                    ax.scatter(x, part[s[0]], s=2, alpha=0.5, color=s[2])
+                    ax.plot(
+                        x,
+                        part[s[0]].rolling(rolling_average, min_periods=1).mean(),
+                        label=s[1] if model is None else "{} ({})".format(s[1], model),
+                        color=s[2],
+                        linestyle=dashes,
+                    )
             ax.set_title("Completion per Iteration ({})".format(m))
             ax.set_xlabel("Iteration")
             ax.set_ylabel("Percent complete ({})".format(m))
@@ -324,4 +581,4 @@ class TrainingMetrics:
                     )
                 ax.axvline(x=label, dashes=[0.25, 0.75], linewidth=0.5, color="black")
 
-        plt.show()
+        show_figure(clear=False)
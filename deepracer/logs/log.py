@@ -3,9 +3,9 @@ import json
 import os
 import pandas as pd
 import re
-from joblib import Parallel, delayed
 
-from . import SimulationLogsIO
+from .instrumentation import Instrumentation, instrument
+from .log_utils import SimulationLogsIO
 
 
 CONSOLE_MODEL_WITH_LOGS = 0
@@ -81,6 +81,7 @@ class DeepRacerLog:
 
         self.df = None
 
+    @instrument()
     def load(self, force=False):
         """Method that loads DeepRacer trace logs into a dataframe.
         """
@@ -90,7 +91,11 @@ class DeepRacerLog:
             raise Exception(
                 "Cannot detect training-simtrace, is model_folder pointing at your model folder?")
 
-        model_iterations = glob.glob(self.simtrace_path)
+        from joblib import Parallel, delayed
+
+        with Instrumentation.span("DeepRacerLog.discover") as span:
+            model_iterations = glob.glob(self.simtrace_path)
+            span.add(rows=len(model_iterations))
 
         def read_csv(path):
             try:
@@ -113,15 +118,21 @@ class DeepRacerLog:
 
             return df
 
-        dfs = Parallel(n_jobs=-1, prefer="threads")(
-            delayed(read_csv)(path) for _, path in enumerate(model_iterations)
-        )
+        with Instrumentation.span("DeepRacerLog.parse") as span:
+            dfs = Parallel(n_jobs=-1, prefer="threads")(
+                delayed(read_csv)(path) for _, path in enumerate(model_iterations)
+            )
+            if Instrumentation.enabled:
+                span.add(rows=sum(len(df) for df in dfs),
+                         bytes_read=sum(os.path.getsize(path) for path in model_iterations))
 
         if len(dfs) == 0:
             return
 
         # Merge into single large DataFrame
-        df = pd.concat(dfs, ignore_index=True)
+        with Instrumentation.span("DeepRacerLog.concat") as span:
+            df = pd.concat(dfs, ignore_index=True)
+            span.add(rows=df.shape[0])
 
         episodes_per_worker_per_iteration = df[(
             df["iteration"] == 0) & (df["worker"] == 0)]["episode"].max()
@@ -130,8 +141,10 @@ class DeepRacerLog:
         df["unique_episode"] = df["episode"] + df["worker"] * episodes_per_worker_per_iteration + \
             df["iteration"] * episodes_per_worker_per_iteration * workers_count
 
-        self.df = df.sort_values(['unique_episode', 'steps']).reset_index(drop=True)
+        with Instrumentation.span("DeepRacerLog.sort", rows=df.shape[0]):
+            self.df = df.sort_values(['unique_episode', 'steps']).reset_index(drop=True)
 
+    @instrument()
     def load_robomaker_logs(self, force=False):
         """Method that loads a DeepRacer RoboMaker log into a dataframe.
         """
@@ -18,15 +18,16 @@ SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 from datetime import datetime
 from decimal import Decimal
+import os
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-from matplotlib.collections import PatchCollection
-from matplotlib.patches import Rectangle
-from shapely.geometry.polygon import LineString
 
 from ..tracks.track_utils import Track
+from .downsampling import DownsamplingUtils
+from .instrumentation import Instrumentation, instrument
+from .render import show_figure
+from .stream_statistics import QuantileSketch, quantile_name
 
 
 class SimulationLogsIO:
@@ -48,15 +49,19 @@ class SimulationLogsIO:
         if data is None:
             data = []
 
-        with open(fname, 'r') as f:
+        with Instrumentation.span("SimulationLogsIO.load_single_file") as span, \
+                open(fname, 'r') as f:
+            loaded = len(data)
             for line in f.readlines():
                 if "SIM_TRACE_LOG" in line:
                     parts = line.split("SIM_TRACE_LOG:")[1].split('\t')[0].split(",")
                     data.append(",".join(parts))
+            span.add(rows=len(data) - loaded, bytes_read=os.fstat(f.fileno()).st_size)
 
         return data
 
     @staticmethod
+    @instrument()
     def load_data(fname):
         """Load all log files for a given simulation
 
@@ -87,6 +92,7 @@ class SimulationLogsIO:
         return data
 
     @staticmethod
+    @instrument()
     def convert_to_pandas(data, episodes_per_iteration=20):
         """Load the log data to pandas dataframe
 
@@ -162,6 +168,7 @@ class SimulationLogsIO:
         return df
 
     @staticmethod
+    @instrument()
     def load_a_list_of_logs(logs):
         """Loads multiple logs from the list of tuples
 
@@ -190,6 +197,7 @@ class SimulationLogsIO:
             ['stream', 'episode', 'steps']).reset_index()
 
     @staticmethod
+    @instrument()
     def load_pandas(fname, episodes_per_iteration=20):
         """Load from a file directly to pandas dataframe
 
@@ -227,7 +235,9 @@ class AnalysisUtils:
     in form which allows drawing conclusions from them
     """
     @staticmethod
-    def simulation_agg(panda, firstgroup='iteration', add_tstamp=False, is_eval=False):
+    @instrument()
+    def simulation_agg(panda, firstgroup='iteration', add_tstamp=False, is_eval=False,
+                       engine='groupby', n_jobs=None):
         """Groups all log data by episodes and other information and returns
         a pandas dataframe with aggregated information
 
@@ -256,38 +266,236 @@ class AnalysisUtils:
         for multiple log files loaded stream would be preferred
         add_tstamp - whether to add a timestamp, by default False
         is_eval - is data for evaluation (training if False), default: False
+        engine - how to aggregate: 'groupby' or 'segments'. The 'segments' engine
+            computes the aggregates with NumPy segmented reductions, without hashing,
+            when data is sorted by firstgroup and episode, and falls back to groupby
+            otherwise. Default: 'groupby'
+        n_jobs - number of processes to aggregate with. When set, data is split into
+            partitions by firstgroup (e.g. stream or model) which are aggregated in
+            a process pool, with input columns shared as memory mapped arrays.
+            -1 means all CPUs. Default: None (aggregate in the current process)
+
+        Decimal timestamps, as loaded by SimulationLogsIO, are converted to float in
+        panda itself, so the conversion is paid once per dataframe and not on every call.
 
         Returns:
         Aggregated dataframe
         """
-        grouped = panda.groupby([firstgroup, 'episode'])
+        if not is_eval and 'new_reward' not in panda.columns:
+            print('new reward not found, using reward as its values')
+            panda['new_reward'] = panda['reward']
 
-        by_steps = grouped['steps'].agg(np.max).reset_index()
-        by_start = grouped.first()['closest_waypoint'].reset_index() \
-            .rename(index=str, columns={"closest_waypoint": "start_at"})
-        by_progress = grouped['progress'].agg(np.max).reset_index()
-        by_speed = grouped['speed'].agg(np.mean).reset_index()
-        by_time = grouped['tstamp'].agg(np.ptp).reset_index() \
-            .rename(index=str, columns={"tstamp": "time"})
-        by_time['time'] = by_time['time'].astype(float)
+        if panda['tstamp'].dtype == object:
+            panda['tstamp'] = panda['tstamp'].astype(float)
 
-        result = by_steps \
-            .merge(by_start) \
-            .merge(by_progress, on=[firstgroup, 'episode']) \
-            .merge(by_time, on=[firstgroup, 'episode'])
+        result = AnalysisUtils._episode_aggregates(panda, firstgroup, is_eval, engine, n_jobs)
 
+        return AnalysisUtils._finish_aggregates(result, firstgroup, add_tstamp, is_eval)
+
+    @staticmethod
+    def _episode_aggregates(panda, firstgroup, is_eval, engine='groupby', n_jobs=None):
+        """Computes raw per episode aggregates in a single grouped pass
+
+        Returns a dataframe with group keys, steps, start_at, progress, time,
+        new_reward and reward (training only), speed and tstamp (as float seconds
+        of the last step).
+        """
+        aggregations = {
+            'steps': ('steps', 'max'),
+            'start_at': ('closest_waypoint', 'first'),
+            'progress': ('progress', 'max'),
+            'tstamp_min': ('tstamp', 'min'),
+            'tstamp': ('tstamp', 'max'),
+            'speed': ('speed', 'mean'),
+        }
         if not is_eval:
-            if 'new_reward' not in panda.columns:
-                print('new reward not found, using reward as its values')
-                panda['new_reward'] = panda['reward']
-            by_new_reward = grouped['new_reward'].agg(np.sum).reset_index()
-            result = result.merge(by_new_reward, on=[firstgroup, 'episode'])
+            aggregations['new_reward'] = ('new_reward', 'sum')
+            aggregations['reward'] = ('reward', 'sum')
+
+        columns = [firstgroup, 'episode'] + sorted(set(c for c, _ in aggregations.values()))
+        numeric = panda[columns]
+        if numeric['tstamp'].dtype != float:
+            numeric = numeric.assign(tstamp=numeric['tstamp'].astype(float))
+
+        if n_jobs is not None and n_jobs != 1:
+            result = AnalysisUtils._aggregate_partitioned(
+                numeric, [firstgroup, 'episode'], aggregations, n_jobs)
+        else:
+            result = AnalysisUtils._aggregate(
+                numeric, [firstgroup, 'episode'], aggregations, engine)
+        result['time'] = result['tstamp'] - result['tstamp_min']
+
+        return result.drop(columns='tstamp_min')
+
+    @staticmethod
+    def _aggregate(df, keys, aggregations, engine='groupby'):
+        """Named aggregation of df grouped by keys
+
+        Supports 'first', 'min', 'max', 'sum' and 'mean'. With the 'segments' engine and
+        data sorted by keys, groups are found from the offsets where keys change and
+        reduced with NumPy, otherwise a groupby is used.
+
+        Returns a dataframe with keys and aggregated values as columns, sorted by keys.
+        """
+        if engine not in ('groupby', 'segments'):
+            raise Exception("Unknown aggregation engine: %s" % engine)
 
-        result = result.merge(by_speed, on=[firstgroup, 'episode'])
+        starts = AnalysisUtils._segment_starts(df, keys) if engine == 'segments' else None
 
+        if starts is None:
+            return df.groupby(keys).agg(**aggregations).reset_index()
+
+        result = df[keys].iloc[starts].reset_index(drop=True)
+        for name, (column, how) in aggregations.items():
+            result[name] = AnalysisUtils._reduce_segments(df[column].values, starts, how)
+
+        return result
+
+    @staticmethod
+    def _aggregate_partitioned(df, keys, aggregations, n_jobs):
+        """Named aggregation of df grouped by keys, computed in a process pool
+
+        The data is sorted by keys (a no-op check when it already is), split into
+        partitions along changes of the first key and each partition is reduced with
+        the 'segments' engine. Columns are handed to joblib whole, which shares them
+        with the workers as memory mapped arrays, and each worker slices its partition.
+        """
+        import joblib
+
+        # rows with null keys are left out, as groupby does, factorize codes them as -1
+        codes, uniques = pd.factorize(df[keys[0]], sort=True)
+        valid = codes >= 0
+        for key in keys[1:]:
+            valid &= df[key].notna().values
+        if not valid.all():
+            df = df[valid]
+            codes = codes[valid]
+
+        if df.shape[0] == 0:
+            return AnalysisUtils._aggregate(df, keys, aggregations)
+
+        columns = {keys[0]: codes}
+        for column in set(keys[1:] + [c for c, _ in aggregations.values()]):
+            columns[column] = df[column].values
+
+        if AnalysisUtils._segment_starts(df, keys) is None:
+            order = np.lexsort([columns[k] for k in reversed(keys)])
+            columns = {name: values[order] for name, values in columns.items()}
+
+        rows = codes.shape[0]
+        n_workers = joblib.effective_n_jobs(n_jobs)
+        group_starts = np.concatenate(
+            ([0], np.flatnonzero(columns[keys[0]][1:] != columns[keys[0]][:-1]) + 1))
+        targets = np.linspace(0, rows, n_workers * 4 + 1)[1:-1]
+        bounds = np.unique(np.concatenate((
+            [0], group_starts[np.searchsorted(group_starts, targets)
+                              .clip(max=group_starts.shape[0] - 1)], [rows])))
+
+        # arrays above max_nbytes are dumped once per call and memory mapped by workers
+        parts = joblib.Parallel(n_jobs=n_jobs, max_nbytes='1M', mmap_mode='r')(
+            joblib.delayed(AnalysisUtils._aggregate_slice)(
+                columns, keys, start, stop, aggregations)
+            for start, stop in zip(bounds[:-1], bounds[1:])
+        )
+
+        result = pd.concat(parts, ignore_index=True)
+        result[keys[0]] = uniques.take(result[keys[0]].values)
+
+        return result
+
+    @staticmethod
+    def _aggregate_slice(columns, keys, start, stop, aggregations):
+        """Aggregates rows start:stop of sorted columns, run in worker processes
+        """
+        part = pd.DataFrame({name: np.asarray(values[start:stop])
+                             for name, values in columns.items()})
+
+        return AnalysisUtils._aggregate(part, keys, aggregations, engine='segments')
+
+    @staticmethod
+    def _segment_starts(df, keys):
+        """Offsets of the first row of each group in a dataframe sorted by keys
+
+        Returns None if the dataframe is empty, is not sorted by keys or keys
+        contain null values.
+        """
+        if df.shape[0] == 0:
+            return None
+
+        ordered = np.ones(df.shape[0] - 1, dtype=bool)
+        changed = np.zeros(df.shape[0] - 1, dtype=bool)
+
+        for key in reversed(keys):
+            column = df[key]
+            if column.isnull().any():
+                return None
+            if hasattr(column, 'cat'):
+                column = column.cat.codes
+            values = column.values
+
+            same = values[1:] == values[:-1]
+            ordered = (values[1:] > values[:-1]) | (same & ordered)
+            changed |= ~same
+
+        if not ordered.all():
+            return None
+
+        return np.concatenate(([0], np.flatnonzero(changed) + 1))
+
+    @staticmethod
+    def _reduce_segments(values, starts, how):
+        """Reduces values in segments beginning at starts, ignoring NaN like pandas does
+        """
+        has_nan = values.dtype.kind == 'f' and np.isnan(values).any()
+
+        if how == 'first':
+            if not has_nan:
+                return values[starts]
+            # first non-NaN value of each segment, NaN if there is none
+            valid = np.flatnonzero(~np.isnan(values))
+            found = np.searchsorted(valid, starts)
+            ends = np.append(starts[1:], values.shape[0])
+            in_segment = found < valid.shape[0]
+            in_segment[in_segment] = valid[found[in_segment]] < ends[in_segment]
+            result = np.full(starts.shape[0], np.nan)
+            result[in_segment] = values[valid[found[in_segment]]]
+            return result
+
+        if how == 'max':
+            return (np.fmax if has_nan else np.maximum).reduceat(values, starts)
+        if how == 'min':
+            return (np.fmin if has_nan else np.minimum).reduceat(values, starts)
+
+        if has_nan:
+            valid = ~np.isnan(values)
+            values = np.where(valid, values, 0)
+            counts = np.add.reduceat(valid.astype(int), starts)
+        else:
+            counts = np.diff(np.append(starts, values.shape[0]))
+
+        sums = np.add.reduceat(values, starts)
+        if how == 'sum':
+            return sums
+        if how == 'mean':
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return sums / counts
+
+        raise Exception("Unsupported segment reduction: %s" % how)
+
+    @staticmethod
+    def _finish_aggregates(result, firstgroup, add_tstamp, is_eval):
+        """Adds the derived columns to raw per episode aggregates and orders the columns
+        the way simulation_agg returns them
+        """
+        columns = [firstgroup, 'episode', 'steps', 'start_at', 'progress', 'time']
+        if not is_eval:
+            columns.append('new_reward')
+        columns.append('speed')
         if not is_eval:
-            by_reward = grouped['reward'].agg(np.sum).reset_index()
-            result = result.merge(by_reward, on=[firstgroup, 'episode'])
+            columns.append('reward')
+
+        tstamp = result['tstamp']
+        result = result[columns].copy()
 
         result['time_if_complete'] = result['time'] * 100 / result['progress']
 
@@ -297,9 +505,7 @@ class AnalysisUtils:
                                         '1st', '2nd', '3rd', '4th', '5th'])
 
         if add_tstamp:
-            by_tstamp = grouped['tstamp'].agg(np.max).astype(float).reset_index()
-            by_tstamp['tstamp'] = pd.to_datetime(by_tstamp['tstamp'], unit='s')
-            result = result.merge(by_tstamp, on=[firstgroup, 'episode'])
+            result['tstamp'] = pd.to_datetime(tstamp, unit='s')
 
         return result
 
@@ -316,6 +522,8 @@ class AnalysisUtils:
         title - what title to give to the charts (None by default)
         is_eval - is it evaluation data (training if False), by default False
         """
+        import matplotlib.pyplot as plt
+
         fig, axes = plt.subplots(nrows=2 if is_eval else 3,
                                  ncols=2 if is_eval else 3, figsize=[15, 11])
         if title:
@@ -331,8 +539,7 @@ class AnalysisUtils:
         aggregate_df.plot.scatter('time', 'steps', ax=axes[0, 1])
         aggregate_df.hist(column=['progress'], bins=20, ax=axes[1, 1])
 
-        plt.show()
-        plt.clf()
+        show_figure()
 
     @staticmethod
     def scatter_by_groups(aggregate_df, group_category='quintile', title=None):
@@ -348,6 +555,8 @@ class AnalysisUtils:
         group_category - what to group the data by, default: quintile
         title - what title to put over the charts, default: None
         """
+        import matplotlib.pyplot as plt
+
         grouped = aggregate_df.groupby(group_category)
         groupcount = len(grouped.groups.keys())
 
@@ -365,8 +574,254 @@ class AnalysisUtils:
             group.hist(column=['progress'], bins=20, ax=axes[row, 3])
             row += 1
 
-        plt.show()
-        plt.clf()
+        show_figure()
+
+    @staticmethod
+    def partition(df, column, ids=None):
+        """Split a dataframe into groups of rows sharing a value of a column, in one scan
+
+        If the column is sorted, e.g. episode in a loaded log, each group is a slice found
+        by binary search and returned without copying. Otherwise the rows of all groups
+        are located in a single groupby.
+
+        Arguments:
+        df - dataframe to split
+        column - column to split by, e.g. episode or iteration
+        ids - values of the column to return groups for, in the order they are wanted,
+            default: None (all values, sorted)
+
+        Returns:
+        A list of tuples of (id, dataframe with the rows of id), the dataframe is empty
+        for ids not found
+        """
+        if ids is None:
+            ids = np.sort(df[column].dropna().unique())
+
+        if df[column].is_monotonic_increasing:
+            values = df[column].to_numpy()
+            starts = np.searchsorted(values, ids, side='left')
+            stops = np.searchsorted(values, ids, side='right')
+            return [(i, df.iloc[start:stop]) for i, start, stop in zip(ids, starts, stops)]
+
+        positions = df.groupby(column, sort=False).indices
+        missing = np.empty(0, dtype=int)
+        return [(i, df.take(positions.get(i, missing))) for i in ids]
+
+    @staticmethod
+    @instrument()
+    def lap_metrics(df, group='episode'):
+        """Calculate distance travelled, lap time and speeds of all episodes at once
+
+        Steps of all episodes are handled as whole arrays: distances between consecutive
+        steps are computed once, those crossing from one episode to the next are masked
+        out and the rest is reduced per episode. Rows of an episode are taken in the order
+        they have in df, which is the order of steps in a loaded log.
+
+        Arguments:
+        df - dataframe with steps
+        group - column or list of columns identifying an episode, e.g.
+            ['stream', 'episode'] for evaluations, default: episode. If None all rows
+            are one episode
+
+        Returns:
+        A dataframe with a row per episode, sorted by group, and columns:
+        * the group columns
+        * distance - distance travelled in meters
+        * lap_time - time between the first and the last step in seconds
+        * velocity - distance divided by lap_time in m/s
+        * average_speed - mean of the speed of the steps
+        * progress - highest progress reached
+        """
+        keys = [] if group is None else [group] if isinstance(group, str) else list(group)
+        metrics = ['distance', 'lap_time', 'velocity', 'average_speed', 'progress']
+
+        if df.shape[0] == 0:
+            return pd.DataFrame(columns=keys + metrics)
+
+        order = None
+        starts = AnalysisUtils._segment_starts(df, keys) if keys else np.zeros(1, dtype=int)
+        if starts is None:
+            # a stable sort keeps the steps of each episode in their order
+            codes = df.groupby(keys, sort=True).ngroup().values
+            order = np.argsort(codes, kind='mergesort')
+            order = order[codes[order] >= 0]
+            codes = codes[order]
+            starts = np.concatenate(([0], np.flatnonzero(codes[1:] != codes[:-1]) + 1))
+
+        def values(column):
+            result = df[column].to_numpy(dtype=float)
+            return result if order is None else result[order]
+
+        x = values('x')
+        y = values('y')
+        step_distance = np.zeros(x.shape[0])
+        step_distance[1:] = np.hypot(np.diff(x), np.diff(y))
+        step_distance[starts] = 0
+
+        tstamp = values('tstamp')
+        first = starts if order is None else order[starts]
+
+        result = df[keys].iloc[first].reset_index(drop=True)
+        result['distance'] = AnalysisUtils._reduce_segments(step_distance, starts, 'sum')
+        result['lap_time'] = (AnalysisUtils._reduce_segments(tstamp, starts, 'max')
+                              - AnalysisUtils._reduce_segments(tstamp, starts, 'min'))
+        result['velocity'] = result['distance'] / result['lap_time']
+        result['average_speed'] = AnalysisUtils._reduce_segments(
+            values('speed'), starts, 'mean')
+        result['progress'] = AnalysisUtils._reduce_segments(values('progress'), starts, 'max')
+
+        return result
+
+    @staticmethod
+    @instrument()
+    def training_progress(aggregates):
+        """Calculate training progress statistics per iteration
+
+        Computes all statistics in a single grouped pass without modifying the input
+        or plotting anything, which makes it suitable for batch processing.
+
+        Arguments:
+        aggregates - aggregated dataframe, as returned by simulation_agg
+
+        Returns:
+        A dataframe with one row per iteration and columns:
+        * iteration
+        * episodes - number of episodes
+        * completed - number of complete laps (progress of 100)
+        * completion_rate - ratio of complete laps to all episodes in iteration, 0-1
+        * reward_mean, reward_std - reward statistics (if reward is available)
+        * time_mean, time_std - time statistics
+        * progress_mean, progress_std - progress statistics
+        * complete_time_mean, complete_time_min, complete_time_max - time statistics
+            for complete laps, NaN if there were none
+        """
+        complete = (aggregates['progress'] == 100).values
+
+        stats_input = pd.DataFrame({
+            'iteration': aggregates['iteration'].values,
+            'complete': complete.astype(int),
+            'time': aggregates['time'].values,
+            'progress': aggregates['progress'].values,
+            'complete_time': np.where(complete, aggregates['time'].values, np.nan),
+        })
+
+        aggregations = {
+            'episodes': ('complete', 'size'),
+            'completed': ('complete', 'sum'),
+            'completion_rate': ('complete', 'mean'),
+        }
+        if 'reward' in aggregates.columns:
+            stats_input['reward'] = aggregates['reward'].values
+            aggregations['reward_mean'] = ('reward', 'mean')
+            aggregations['reward_std'] = ('reward', 'std')
+
+        aggregations.update({
+            'time_mean': ('time', 'mean'),
+            'time_std': ('time', 'std'),
+            'progress_mean': ('progress', 'mean'),
+            'progress_std': ('progress', 'std'),
+            'complete_time_mean': ('complete_time', 'mean'),
+            'complete_time_min': ('complete_time', 'min'),
+            'complete_time_max': ('complete_time', 'max'),
+        })
+
+        return stats_input.groupby('iteration').agg(**aggregations).reset_index()
+
+    @staticmethod
+    @instrument()
+    def quantile_sketches(aggregates, columns=('time_if_complete', 'progress'),
+                          group='iteration', compression=200):
+        """Build quantile sketches of columns per group
+
+        Sketches are compact and can be merged, so they can be built separately for each
+        worker or log file (also in parallel) and combined with merge_quantile_sketches.
+        Non-finite values (e.g. time_if_complete of episodes with no progress) are skipped.
+
+        Arguments:
+        aggregates - aggregated dataframe, as returned by simulation_agg
+        columns - columns to sketch, default: time_if_complete and progress
+        group - column to group by, default: iteration
+        compression - accuracy parameter of QuantileSketch, default: 200
+
+        Returns:
+        A dictionary mapping column to a dictionary mapping group value to QuantileSketch
+        """
+        grouped = aggregates.groupby(group)
+
+        return {
+            c: {key: QuantileSketch.from_values(values.values, compression)
+                for key, values in grouped[c]}
+            for c in columns
+        }
+
+    @staticmethod
+    def merge_quantile_sketches(*sketches):
+        """Merge quantile sketches built with quantile_sketches
+
+        Arguments:
+        sketches - results of quantile_sketches to merge
+
+        Returns:
+        A dictionary of merged sketches, in the format of quantile_sketches
+        """
+        merged = {}
+        for sketch_dict in sketches:
+            for c, by_group in sketch_dict.items():
+                merged_column = merged.setdefault(c, {})
+                for key, sketch in by_group.items():
+                    if key not in merged_column:
+                        merged_column[key] = QuantileSketch(sketch.compression)
+                    merged_column[key].merge(sketch)
+
+        return merged
+
+    @staticmethod
+    @instrument()
+    def iteration_quantiles(aggregates=None, columns=('time_if_complete', 'progress'),
+                            quantiles=(0.5, 0.9, 0.99), group='iteration',
+                            approximate=False, compression=200, sketches=None):
+        """Quantiles of columns per iteration (or other group)
+
+        Non-finite values are skipped.
+
+        Arguments:
+        aggregates - aggregated dataframe, as returned by simulation_agg
+        columns - columns to calculate quantiles of, default: time_if_complete and progress
+        quantiles - quantiles to calculate, default: 0.5, 0.9 and 0.99
+        group - column to group by, default: iteration
+        approximate - use quantile sketches instead of exact quantiles, which avoids
+            holding and sorting the values, default: False
+        compression - accuracy parameter of the sketches, default: 200
+        sketches - precomputed result of quantile_sketches (or merge_quantile_sketches)
+            to use instead of aggregates, default: None
+
+        Returns:
+        A dataframe indexed by group with a column per column and quantile,
+        e.g. time_if_complete_q50, progress_q99
+        """
+        result = {}
+
+        if sketches is not None or approximate:
+            if sketches is None:
+                sketches = AnalysisUtils.quantile_sketches(
+                    aggregates, columns, group, compression)
+            for c in columns:
+                keys = sorted(sketches[c])
+                values = np.array([sketches[c][key].quantile(quantiles) for key in keys])
+                for i, q in enumerate(quantiles):
+                    result['%s_%s' % (c, quantile_name(q))] = \
+                        pd.Series(values[:, i] if len(keys) else [], index=keys, dtype=float)
+        else:
+            for c in columns:
+                finite = aggregates[c].where(np.isfinite(aggregates[c]))
+                grouped = finite.groupby(aggregates[group])
+                for q in quantiles:
+                    result['%s_%s' % (c, quantile_name(q))] = grouped.quantile(q)
+
+        result = pd.DataFrame(result)
+        result.index.name = group
+
+        return result
 
     @staticmethod
     def analyze_training_progress(aggregates, title=None):
@@ -382,26 +837,23 @@ class AnalysisUtils:
         * mean progress with standard deviation
         * completion rate (ratio of complete laps to all episodes in iteration, 0-1)
 
+        Statistics are calculated with training_progress, use it directly
+        if you do not need the charts.
+
         Arguments:
         aggregates - aggregated dataframe to analyze
         title - what title to put over the charts, default: None
-        """
-        aggregates['complete'] = np.where(aggregates['progress'] == 100, 1, 0)
-
-        grouped = aggregates.groupby('iteration')
 
-        reward_per_iteration = grouped['reward'].agg([np.mean, np.std]).reset_index()
-        time_per_iteration = grouped['time'].agg([np.mean, np.std]).reset_index()
-        progress_per_iteration = grouped['progress'].agg([np.mean, np.std]).reset_index()
-
-        complete_laps = aggregates[aggregates['progress'] == 100.0]
-        complete_grouped = complete_laps.groupby('iteration')
+        Returns:
+        Statistics per iteration, as returned by training_progress
+        """
+        import matplotlib.pyplot as plt
 
-        complete_times = complete_grouped['time'].agg([np.mean, np.min, np.max]).reset_index()
+        stats = AnalysisUtils.training_progress(aggregates)
 
-        total_completion_rate = complete_laps.shape[0] / aggregates.shape[0]
+        complete_times = stats[stats['completed'] > 0]
 
-        complete_per_iteration = grouped['complete'].agg([np.mean]).reset_index()
+        total_completion_rate = stats['completed'].sum() / stats['episodes'].sum()
 
         print('Number of episodes = ', np.max(aggregates['episode']))
         print('Number of iterations = ', np.max(aggregates['iteration']))
@@ -411,29 +863,30 @@ class AnalysisUtils:
         if title:
             fig.suptitle(title)
 
-        AnalysisUtils.plot(axes[0, 0], reward_per_iteration, 'iteration', 'Iteration',
-                           'mean', 'Mean reward', 'Rewards per Iteration')
-        AnalysisUtils.plot(axes[1, 0], reward_per_iteration, 'iteration',
-                           'Iteration', 'std', 'Std dev of reward', 'Dev of reward')
+        AnalysisUtils.plot(axes[0, 0], stats, 'iteration', 'Iteration',
+                           'reward_mean', 'Mean reward', 'Rewards per Iteration')
+        AnalysisUtils.plot(axes[1, 0], stats, 'iteration',
+                           'Iteration', 'reward_std', 'Std dev of reward', 'Dev of reward')
         AnalysisUtils.plot(axes[2, 0], aggregates, 'episode', 'Episode', 'reward', 'Total reward')
 
-        AnalysisUtils.plot(axes[0, 1], time_per_iteration, 'iteration',
-                           'Iteration', 'mean', 'Mean time', 'Times per Iteration')
-        AnalysisUtils.plot(axes[1, 1], time_per_iteration, 'iteration',
-                           'Iteration', 'std', 'Std dev of time', 'Dev of time')
+        AnalysisUtils.plot(axes[0, 1], stats, 'iteration',
+                           'Iteration', 'time_mean', 'Mean time', 'Times per Iteration')
+        AnalysisUtils.plot(axes[1, 1], stats, 'iteration',
+                           'Iteration', 'time_std', 'Std dev of time', 'Dev of time')
         if complete_times.shape[0] > 0:
             AnalysisUtils.plot(axes[2, 1], complete_times, 'iteration', 'Iteration',
-                               'mean', 'Time', 'Mean completed laps time')
+                               'complete_time_mean', 'Time', 'Mean completed laps time')
 
-        AnalysisUtils.plot(axes[0, 2], progress_per_iteration, 'iteration', 'Iteration', 'mean',
+        AnalysisUtils.plot(axes[0, 2], stats, 'iteration', 'Iteration', 'progress_mean',
                            'Mean progress', 'Progress per Iteration')
-        AnalysisUtils.plot(axes[1, 2], progress_per_iteration, 'iteration',
-                           'Iteration', 'std', 'Std dev of progress', 'Dev of progress')
-        AnalysisUtils.plot(axes[2, 2], complete_per_iteration, 'iteration', 'Iteration', 'mean',
+        AnalysisUtils.plot(axes[1, 2], stats, 'iteration',
+                           'Iteration', 'progress_std', 'Std dev of progress', 'Dev of progress')
+        AnalysisUtils.plot(axes[2, 2], stats, 'iteration', 'Iteration', 'completion_rate',
                            'Completion rate', 'Completion rate (avg: %s)' % total_completion_rate)
 
-        plt.show()
-        plt.clf()
+        show_figure()
+
+        return stats
 
     @staticmethod
     def plot(ax, df, xval, xlabel, yval, ylabel, title=None):
@@ -448,6 +901,8 @@ class AnalysisUtils:
         ylabel - what label to give the y axis
         title - what title to put over the chart, default: None
         """
+        import matplotlib.pyplot as plt
+
         df.plot.scatter(xval, yval, ax=ax, s=5, alpha=0.7)
         if title:
             ax.set_title(title)
@@ -457,6 +912,90 @@ class AnalysisUtils:
         plt.grid(True)
 
 
+class EpisodeAggregates:
+    """Per episode aggregates kept up to date as new steps arrive
+
+    Meant for live training analysis: instead of running AnalysisUtils.simulation_agg
+    over the whole growing dataframe on every refresh, append the new steps only.
+    Episodes which have finished (a step with done set, or an episode_status other
+    than in_progress when there is no done column) are aggregated once and kept,
+    only the steps of episodes still in progress are held until they finish.
+    """
+
+    def __init__(self, firstgroup='iteration', add_tstamp=False, is_eval=False,
+                 engine='segments'):
+        """Create EpisodeAggregates object
+
+        Arguments:
+        firstgroup - first group to group by, by default iteration,
+        for multiple log files loaded stream would be preferred
+        add_tstamp - whether to add a timestamp, by default False
+        is_eval - is data for evaluation (training if False), default: False
+        engine - aggregation engine, see AnalysisUtils.simulation_agg, default: segments
+        """
+        self.firstgroup = firstgroup
+        self.add_tstamp = add_tstamp
+        self.is_eval = is_eval
+        self.engine = engine
+
+        self._finished = []
+        self._open = None
+
+    @instrument()
+    def append(self, panda):
+        """Add a chunk of steps
+
+        Arguments:
+        panda - dataframe with new simulation steps, in the format accepted by
+            AnalysisUtils.simulation_agg
+        """
+        if not self.is_eval and 'new_reward' not in panda.columns:
+            panda = panda.assign(new_reward=panda['reward'])
+
+        if self._open is not None:
+            panda = pd.concat([self._open, panda], ignore_index=True)
+
+        keys = pd.MultiIndex.from_frame(panda[[self.firstgroup, 'episode']])
+        finished = keys.isin(keys[self._episode_ends(panda)])
+
+        if finished.any():
+            self._finished.append(AnalysisUtils._episode_aggregates(
+                panda[finished], self.firstgroup, self.is_eval, self.engine))
+
+        self._open = panda[~finished]
+
+    def dataframe(self):
+        """Aggregated dataframe, same as AnalysisUtils.simulation_agg would return
+        for all steps appended so far
+
+        Episodes still in progress are included with the steps received so far.
+        """
+        if len(self._finished) > 1:
+            self._finished = [pd.concat(self._finished, ignore_index=True)]
+
+        parts = list(self._finished)
+        if self._open is not None and self._open.shape[0] > 0:
+            parts.append(AnalysisUtils._episode_aggregates(
+                self._open, self.firstgroup, self.is_eval, self.engine))
+
+        if len(parts) == 0:
+            return None
+
+        result = pd.concat(parts, ignore_index=True) \
+            .sort_values([self.firstgroup, 'episode'], kind='mergesort') \
+            .reset_index(drop=True)
+
+        return AnalysisUtils._finish_aggregates(
+            result, self.firstgroup, self.add_tstamp, self.is_eval)
+
+    @staticmethod
+    def _episode_ends(panda):
+        if 'done' in panda.columns:
+            return panda['done'].isin([True, 'True']).values
+
+        return (panda['episode_status'] != 'in_progress').values
+
+
 class PlottingUtils:
     """Utilities to visualise track and the episodes
     """
@@ -469,20 +1008,57 @@ class PlottingUtils:
         track - the track info to plot
         color - what color to plot the border in, default: lightgrey
         """
-        line = LineString(track.center_line)
-        PlottingUtils._plot_coords(ax, line)
-        PlottingUtils._plot_line(ax, line, color)
+        PlottingUtils._plot_border_lines(ax, track.border_lines, track.border_points, color)
 
-        line = LineString(track.inner_border)
-        PlottingUtils._plot_coords(ax, line)
-        PlottingUtils._plot_line(ax, line, color)
+    @staticmethod
+    def track_background(track: Track, margin=1, resolution=100, color='lightgrey'):
+        """Image of the track borders on a transparent background
 
-        line = LineString(track.outer_border)
-        PlottingUtils._plot_coords(ax, line)
-        PlottingUtils._plot_line(ax, line, color)
+        The image has the size and pixel coordinates of PlottingUtils.rasterize results
+        and can be drawn with imshow(origin="lower") over or under them instead of drawing
+        the track geometry again. It is rendered once per track and parameters and cached
+        in track.background_cache.
+
+        Arguments:
+        track - the track info to render
+        margin - margin around the track in meters, default: 1
+        resolution - pixels per meter, default: 100
+        color - what color to render the border in, default: lightgrey
+
+        Returns:
+        An RGBA image as a numpy array of shape (height, width, 4), indexed by [y, x] pixel
+        """
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        key = (margin, resolution, color)
+        if key not in track.background_cache:
+            width, height = np.ceil(
+                (np.asarray(track.size()) + 2 * margin) * resolution).astype(int)
+            origin = track.outer_border.min(axis=0) - margin
+
+            fig = Figure(figsize=(width / 100, height / 100), dpi=100)
+            fig.patch.set_alpha(0)
+            canvas = FigureCanvasAgg(fig)
+            ax = fig.add_axes([0, 0, 1, 1])
+            ax.set_axis_off()
+            ax.set_xlim(0, width)
+            ax.set_ylim(0, height)
+
+            PlottingUtils._plot_border_lines(
+                ax, [(line - origin) * resolution for line in track.border_lines],
+                (track.border_points - origin) * resolution, color)
+
+            canvas.draw()
+            image = np.asarray(canvas.buffer_rgba())[::-1, :width].copy()
+            track.background_cache[key] = image
+
+        return track.background_cache[key]
 
     @staticmethod
-    def plot_selected_laps(sorted_idx, df, track: Track, section_to_plot="episode"):
+    @instrument()
+    def plot_selected_laps(sorted_idx, df, track: Track, section_to_plot="episode",
+                           max_points=None, montage=False, columns=4, resolution=20):
         """Plot n laps in the training, referenced by episode ids
 
         Arguments:
@@ -490,44 +1066,153 @@ class PlottingUtils:
         df - a datagram with all data
         track - track info for plotting
         secton_to_plot - what section of data to plot - episode/iteration
+        max_points - maximum number of points plotted per lap, laps with more steps are
+            decimated with DownsamplingUtils.lttb_frame, default: None (all points)
+        montage - plot all laps as tiles of a single image made by lap_montage instead
+            of a subplot per lap, which keeps the figure small for many laps,
+            default: False
+        columns - number of tiles per row in montage mode, default: 4
+        resolution - pixels per meter of the tiles in montage mode, default: 20
         """
+        import matplotlib.pyplot as plt
 
         ids = sorted_idx
 
         if type(sorted_idx) is not list:
             ids = sorted_idx[section_to_plot].unique().tolist()
 
-        n_laps = len(ids)
+        if montage:
+            image = PlottingUtils.lap_montage(
+                ids, df, track, section_to_plot, columns=columns, resolution=resolution)
+            tile_height = image.shape[0] // max(1, int(np.ceil(len(ids) / columns)))
+            tile_width = image.shape[1] // columns
+
+            # the height is capped, imshow then scales the image down to fit
+            fig = plt.figure(figsize=(12, min(12 * image.shape[0] / image.shape[1], 40)))
+            ax = fig.add_axes([0, 0, 1, 1])
+            ax.set_axis_off()
+            ax.imshow(image, interpolation='nearest')
+            for i, lap in enumerate(ids):
+                ax.text((i % columns) * tile_width + 4, (i // columns) * tile_height + 4,
+                        str(lap), va='top', fontsize=8)
+
+            show_figure()
+            return
 
-        fig = plt.figure(n_laps, figsize=(12, n_laps * 10))
-        for i in range(n_laps):
-            idx = ids[i]
+        n_laps = len(ids)
 
-            data_to_plot = df[df[section_to_plot] == idx]
+        laps = AnalysisUtils.partition(df, section_to_plot, ids)
 
+        fig = plt.figure(n_laps, figsize=(12, n_laps * 10))
+        for i, (_, data_to_plot) in enumerate(laps):
             ax = fig.add_subplot(n_laps, 1, i + 1)
 
             ax.axis('equal')
 
             PlottingUtils.print_border(ax, track, color='cyan')
 
-            data_to_plot.plot.scatter('x', 'y', ax=ax, s=10, c='blue')
+            data_to_plot = DownsamplingUtils.lttb_frame(data_to_plot, max_points)
+            PlottingUtils.plot_trajectories(ax, data_to_plot, color='blue')
 
-        plt.show()
-        plt.clf()
+        show_figure()
 
         # return fig
 
     @staticmethod
+    @instrument()
+    def lap_montage(ids, df, track: Track, section_to_plot="episode", columns=4, margin=1,
+                    resolution=20, value_field=None, cmap='plasma', color=(0, 0, 255),
+                    point_size=1):
+        """Render laps into tiles of a single image
+
+        Every lap is rasterized into a tile of a fixed size over the cached track
+        background, tiles are composed into a grid with NumPy. Memory used depends on
+        the number of tiles and the resolution only, not on the number of steps.
+
+        Arguments:
+        ids - list of episode or iteration ids to render, in the order of the tiles
+        df - a datagram with all data
+        track - track info for plotting
+        section_to_plot - column the ids refer to, default: episode
+        columns - number of tiles per row, default: 4
+        margin - margin around the track in meters, default: 1
+        resolution - pixels per meter, default: 20
+        value_field - column to colour steps by, mean of steps in a pixel is used,
+            default: None (use color)
+        cmap - colour map of the values, shared by all tiles, default: plasma
+        color - RGB colour of steps if value_field is None, default: (0, 0, 255)
+        point_size - radius of a step in pixels, 0 for single pixels, default: 1
+
+        Returns:
+        An RGB image as a numpy array of shape (height, width, 3) of type uint8, the top
+        left tile is the first lap
+        """
+        import matplotlib.pyplot as plt
+        from matplotlib.colors import Normalize
+
+        background = PlottingUtils.track_background(track, margin, resolution, color='cyan')
+        alpha = background[:, :, 3:] / 255.0
+        tile = (background[:, :, :3] * alpha + 255 * (1 - alpha)).astype(np.uint8)
+        height, width = tile.shape[:2]
+
+        laps = AnalysisUtils.partition(df, section_to_plot, ids)
+        rows = max(1, int(np.ceil(len(laps) / columns)))
+        image = np.full((rows * height, columns * width, 3), 255, dtype=np.uint8)
+
+        if value_field is not None and laps:
+            values = pd.concat([lap[value_field] for _, lap in laps])
+            norm = Normalize(values.min(), values.max())
+            colormap = plt.get_cmap(cmap)
+
+        offsets = [(dy, dx) for dy in range(-point_size, point_size + 1)
+                   for dx in range(-point_size, point_size + 1)
+                   if dy * dy + dx * dx <= point_size * point_size]
+
+        for i, (_, lap) in enumerate(laps):
+            top, left = (i // columns) * height, (i % columns) * width
+            target = image[top:top + height, left:left + width]
+            target[:] = tile
+
+            if lap.empty:
+                continue
+
+            # rasters have y growing upwards, images downwards
+            mask = PlottingUtils.rasterize(
+                lap, track, margin=margin, resolution=resolution, how='count')[::-1] > 0
+            if value_field is None:
+                colors = np.broadcast_to(np.asarray(color, dtype=np.uint8), tile.shape)
+            else:
+                raster = PlottingUtils.rasterize(
+                    lap, track, value_field, margin, resolution, how='mean')[::-1]
+                colors = (colormap(norm(raster))[:, :, :3] * 255).astype(np.uint8)
+
+            # every step is drawn as a disc of point_size by shifting the step pixels
+            for dy, dx in offsets:
+                source = (slice(max(-dy, 0), height - max(dy, 0)),
+                          slice(max(-dx, 0), width - max(dx, 0)))
+                shifted = (slice(max(dy, 0), height - max(-dy, 0)),
+                           slice(max(dx, 0), width - max(-dx, 0)))
+                selected = mask[source]
+                target[shifted][selected] = colors[source][selected]
+
+        return image
+
+    @staticmethod
+    @instrument()
     def plot_evaluations(evaluations, track: Track, graphed_value='speed'):
         """Plot graphs for evaluations
         """
         from math import ceil
 
+        import matplotlib.pyplot as plt
+
+        metrics = AnalysisUtils.lap_metrics(
+            evaluations, ['stream', 'episode']).set_index(['stream', 'episode'])
+
         streams = evaluations.sort_values(
             'tstamp', ascending=False).groupby('stream', sort=False)
 
-        for _, stream in streams:
+        for stream_id, stream in streams:
             episodes = stream.groupby('episode')
             ep_count = len(episodes)
 
@@ -546,30 +1231,44 @@ class PlottingUtils:
                     ax = axes[int(id / 3), id % 3]
 
                 PlottingUtils.plot_grid_world(
-                    episode, track, graphed_value, ax=ax)
+                    episode, track, graphed_value, ax=ax, metrics=metrics.loc[(stream_id, id)])
 
-            plt.show()
-            plt.clf()
+            show_figure()
 
     @staticmethod
+    @instrument()
     def plot_grid_world(
         episode_df,
         track: Track,
         graphed_value='speed',
         min_progress=None,
-        ax=None
+        ax=None,
+        max_points=None,
+        metrics=None
     ):
         """Plot a scaled version of lap, along with speed taken a each position
+
+        Arguments:
+        episode_df - dataframe with steps of one episode
+        track - track info for plotting
+        graphed_value - column to colour the steps by, default: speed
+        min_progress - plot only if the episode progress is above it, default: None
+        ax - axes to plot on, default: None (new figure)
+        max_points - maximum number of steps plotted, longer episodes are decimated with
+            DownsamplingUtils.lttb, default: None (all steps)
+        metrics - row of AnalysisUtils.lap_metrics for the episode, default: None
+            (computed from episode_df)
         """
+        import matplotlib.pyplot as plt
 
-        episode_df.loc[:, 'distance_diff'] = ((episode_df['x'].shift(1) - episode_df['x']) ** 2 + (
-            episode_df['y'].shift(1) - episode_df['y']) ** 2) ** 0.5
+        if metrics is None:
+            metrics = AnalysisUtils.lap_metrics(episode_df, group=None).iloc[0]
 
-        distance = np.nansum(episode_df['distance_diff'])
-        lap_time = np.ptp(episode_df['tstamp'].astype(float))
-        velocity = distance / lap_time
-        average_speed = np.nanmean(episode_df['speed'])
-        progress = np.nanmax(episode_df['progress'])
+        distance = metrics['distance']
+        lap_time = metrics['lap_time']
+        velocity = metrics['velocity']
+        average_speed = metrics['average_speed']
+        progress = metrics['progress']
 
         if not min_progress or progress > min_progress:
 
@@ -587,16 +1286,15 @@ class PlottingUtils:
 
             ax.set_facecolor('midnightblue')
 
-            line = LineString(track.inner_border)
-            PlottingUtils._plot_coords(ax, line)
-            PlottingUtils._plot_line(ax, line)
-
-            line = LineString(track.outer_border)
-            PlottingUtils._plot_coords(ax, line)
-            PlottingUtils._plot_line(ax, line)
+            # inner and outer border, without the center line
+            PlottingUtils._plot_border_lines(
+                ax, track.border_lines[1:], track.border_points[len(track.center_line):],
+                'cyan')
 
-            episode_df.plot.scatter('x', 'y', ax=ax, s=3, c=graphed_value,
-                                    cmap=plt.get_cmap('plasma'))
+            lines = PlottingUtils.plot_trajectories(
+                ax, DownsamplingUtils.lttb_frame(episode_df, max_points, group=None),
+                graphed_value, group=None, cmap='plasma')
+            ax.figure.colorbar(lines, ax=ax, label=graphed_value)
 
             subtitle = '%s%s\n%s\n%s' % (
                 ('Stream: %s, ' % episode_df['stream'].iloc[0]
@@ -607,56 +1305,164 @@ class PlottingUtils:
             ax.set_title(subtitle)
 
             if fig:
-                plt.show()
-                plt.clf()
+                show_figure()
+
+    @staticmethod
+    def plot_trajectories(ax, df, value_field=None, group='episode', cmap='plasma',
+                          norm=None, color='blue', linewidth=2):
+        """Plot paths of the car as lines, optionally coloured by a value of the steps
+
+        All episodes in df are drawn as a single LineCollection of segments between
+        consecutive steps, which is much faster to build and draw than a marker per step.
+        Segments between the last step of an episode and the first one of the next are
+        left out.
+
+        Arguments:
+        ax - axes to plot on
+        df - dataframe with steps, steps of each episode in their order
+        value_field - column to colour each segment by, taken from the step the segment
+            starts at, e.g. speed, reward, steering_angle or action, default: None
+            (use color)
+        group - column or list of columns identifying an episode, default: episode.
+            If None all rows are one path
+        cmap - colour map of the values, default: plasma
+        norm - matplotlib Normalize of the values, e.g. to share colours between plots,
+            default: None (range of the values)
+        color - colour of the lines if value_field is None, default: blue
+        linewidth - width of the lines, default: 2
+
+        Returns:
+        The LineCollection added, e.g. to draw a colour bar for it
+        """
+        from matplotlib.collections import LineCollection
+
+        points = np.column_stack((df['x'].to_numpy(dtype=float),
+                                  df['y'].to_numpy(dtype=float)))
+        keep = np.ones(max(points.shape[0] - 1, 0), dtype=bool)
+        keys = [] if group is None else [group] if isinstance(group, str) else list(group)
+        for key in keys:
+            if key in df.columns:
+                values = df[key].to_numpy()
+                keep &= values[1:] == values[:-1]
+
+        segments = np.stack((points[:-1], points[1:]), axis=1)[keep]
+        lines = LineCollection(segments, linewidths=linewidth, capstyle='round', zorder=3)
+        if value_field is None:
+            lines.set_color(color)
+        else:
+            lines.set_array(df[value_field].to_numpy(dtype=float)[:-1][keep])
+            lines.set_cmap(cmap)
+            if norm is not None:
+                lines.set_norm(norm)
+
+        ax.add_collection(lines)
+        ax.autoscale_view()
+
+        return lines
 
     @staticmethod
-    def plot_track(df, track: Track, value_field="reward", margin=1, cmap="hot"):
+    @instrument()
+    def plot_track(df, track: Track, value_field="reward", margin=1, cmap="hot",
+                   resolution=100, how="last"):
         """Plot track with dots presenting the rewards for steps
+
+        Arguments:
+        df - dataframe with steps to plot
+        track - track info for plotting
+        value_field - column with values to plot, default: reward
+        margin - margin around the track in meters, default: 1
+        cmap - colour map of the values, default: hot
+        resolution - pixels per meter, default: 100
+        how - how values of steps falling into the same pixel are reduced, one of
+            'last', 'max', 'mean', 'sum' or 'count', default: last
         """
+        import matplotlib.pyplot as plt
+
         if df.empty:
             print("The dataframe is empty, check if you have selected an existing subset")
             return
 
-        track_size = (np.asarray(track.size()) + 2*margin).astype(int) * 100
-        track_img = np.zeros(track_size).transpose()
-
-        x_coord = 0
-        y_coord = 1
+        track_img = PlottingUtils.rasterize(
+            df, track, value_field, margin=margin, resolution=resolution, how=how)
 
-        # compensation moves car's coordinates in logs to start at 0 in each dimention
-        x_compensation = track.outer_border[:, 0].min()
-        y_compensation = track.outer_border[:, 1].min()
+        background = PlottingUtils.track_background(track, margin, resolution)
 
-        for _, row in df.iterrows():
-            x = int((row["x"] - x_compensation + margin) * 100)
-            y = int((row["y"] - y_compensation + margin) * 100)
+        plt.figure(1, figsize=(12, 16))
 
-            # clip values that are off track
-            if y >= track_size[y_coord]:
-                y = track_size[y_coord] - 1
-
-            if x >= track_size[x_coord]:
-                x = track_size[x_coord] - 1
+        plt.title("Reward distribution for all actions ")
+        plt.imshow(track_img, cmap=cmap, interpolation='bilinear', origin="lower")
+        plt.imshow(background, origin="lower", zorder=2)
 
-            track_img[y, x] = row[value_field]
+        show_figure()
 
-        fig = plt.figure(1, figsize=(12, 16))
-        ax = fig.add_subplot(111)
+    @staticmethod
+    @instrument()
+    def rasterize(df, track: Track, value_field="reward", margin=1, resolution=100, how="last"):
+        """Rasterize values of steps into an image of the track area
 
-        shifted_track = Track("shifted_track", (track.waypoints -
-                                                [x_compensation, y_compensation]*3 + margin) * 100)
+        All coordinates are converted to pixel indices at once. Positions outside of the
+        image are clipped to its edges, steps without coordinates or values are skipped.
 
-        PlottingUtils.print_border(ax, shifted_track)
+        Arguments:
+        df - dataframe with x and y columns and the value column
+        track - track info, its outer border determines the image area
+        value_field - column with values to rasterize, default: reward
+        margin - margin around the track in meters, default: 1
+        resolution - pixels per meter, default: 100
+        how - how values of steps falling into the same pixel are reduced:
+            'last' - value of the last step (default)
+            'max' - highest value
+            'mean' - mean value
+            'sum' - sum of values
+            'count' - number of steps
 
-        plt.title("Reward distribution for all actions ")
-        plt.imshow(track_img, cmap=cmap, interpolation='bilinear', origin="lower")
+        Returns:
+        A 2D numpy array indexed by [y, x] pixel, zero where no steps were recorded
+        """
+        if how not in ["last", "max", "mean", "sum", "count"]:
+            raise Exception("Unknown reduction: %s" % how)
+
+        origin = track.outer_border.min(axis=0)
+        width, height = np.ceil(
+            (np.asarray(track.size()) + 2 * margin) * resolution).astype(int)
+
+        x = df["x"].to_numpy(dtype=float)
+        y = df["y"].to_numpy(dtype=float)
+        valid = np.isfinite(x) & np.isfinite(y)
+        if how != "count":
+            values = df[value_field].to_numpy(dtype=float)
+            valid &= np.isfinite(values)
+            values = values[valid]
+
+        columns = np.clip(((x[valid] - origin[0] + margin) * resolution).astype(int), 0, width - 1)
+        rows = np.clip(((y[valid] - origin[1] + margin) * resolution).astype(int), 0, height - 1)
+        pixels = rows * width + columns
+        size = width * height
+
+        if how == "count":
+            image = np.bincount(pixels, minlength=size).astype(float)
+        elif how == "sum":
+            image = np.bincount(pixels, weights=values, minlength=size)
+        elif how == "mean":
+            counts = np.bincount(pixels, minlength=size)
+            image = np.bincount(pixels, weights=values, minlength=size)
+            np.divide(image, counts, out=image, where=counts > 0)
+        elif how == "max":
+            image = np.full(size, -np.inf)
+            np.maximum.at(image, pixels, values)
+            image[np.isneginf(image)] = 0
+        else:
+            # first occurrence in the reversed order is the last step written to a pixel
+            pixels, last = np.unique(pixels[::-1], return_index=True)
+            image = np.zeros(size)
+            image[pixels] = values[::-1][last]
 
-        plt.show()
-        plt.clf()
+        return image.reshape(height, width)
 
     @staticmethod
     def plot_trackpoints(track: Track, annotate_every_nth=1):
+        import matplotlib.pyplot as plt
+
         _, ax = plt.subplots(figsize=(20, 10))
         PlottingUtils.plot_points(ax, track.center_line, annotate_every_nth)
         PlottingUtils.plot_points(ax, track.inner_border, annotate_every_nth)
@@ -672,6 +1478,14 @@ class PlottingUtils:
             if i % annotate_every_nth == 0:
                 ax.annotate(i, (p[0], p[1]))
 
+    @staticmethod
+    def _plot_border_lines(ax, lines, points, color):
+        from matplotlib.collections import LineCollection
+
+        ax.plot(points[:, 0], points[:, 1], '.', color='#999999', zorder=1)
+        ax.add_collection(LineCollection(
+            lines, colors=color, alpha=0.7, linewidths=3, capstyle='round', zorder=2))
+
     @staticmethod
     def _plot_coords(ax, ob):
         x, y = ob.xy
@@ -691,16 +1505,19 @@ class PlottingUtils:
 
 class EvaluationUtils:
     @staticmethod
+    @instrument()
     def analyse_single_evaluation(eval_df, track: Track,
                                   min_progress=None):
         """Plot all episodes of a single evaluation
         """
-        episodes = eval_df.groupby('episode').groups
-        for e in episodes:
-            PlottingUtils.plot_grid_world(
-                eval_df[eval_df['episode'] == e], track, min_progress=min_progress)
+        metrics = AnalysisUtils.lap_metrics(eval_df).set_index('episode')
+
+        for episode, episode_df in AnalysisUtils.partition(eval_df, 'episode'):
+            PlottingUtils.plot_grid_world(episode_df, track, min_progress=min_progress,
+                                          metrics=metrics.loc[episode])
 
     @staticmethod
+    @instrument()
     def analyse_multiple_race_evaluations(logs, track: Track, min_progress=None):
         for log in logs:
             EvaluationUtils.analyse_single_evaluation(
@@ -805,6 +1622,7 @@ class NewRewardUtils:
         return params
 
     @staticmethod
+    @instrument()
     def new_reward(panda, center_line, reward_module, verbose=False):
         """Calculate new reward for each step and add to the dataframe
 
@@ -849,6 +1667,9 @@ class ActionBreakdownUtils:
     @staticmethod
     def _make_error_boxes(ax, xdata, ydata, xerror, yerror, facecolor='r',
                           edgecolor='r', alpha=0.3):
+        from matplotlib.collections import PatchCollection
+        from matplotlib.patches import Rectangle
+
         # Create list for all the error patches
         errorboxes = []
 
@@ -867,6 +1688,7 @@ class ActionBreakdownUtils:
         return 0
 
     @staticmethod
+    @instrument()
     def action_breakdown(
         df,
         track: Track,
@@ -874,7 +1696,8 @@ class ActionBreakdownUtils:
         episode_ids=None,
         track_breakdown=None,
         action_names=None,
-        min_reward=0.0
+        min_reward=0.0,
+        max_points=None
     ):
         """Visualise action breakdown for the simulation data
 
@@ -885,7 +1708,12 @@ class ActionBreakdownUtils:
         track_breakdown - interesting sections of the track to show,
             default: None (no sections highlighted)
         action_names - how to call the actions; default: None (names will be generated)
+        min_reward - only steps with at least this reward are shown, default: 0.0
+        max_points - maximum number of steps drawn as points per action, the density
+            of steps is drawn instead for actions with more, default: None (all points)
         """
+        import matplotlib.pyplot as plt
+
         if not action_names:
             action_names = ActionBreakdownUtils.determine_action_names(df)
 
@@ -898,6 +1726,8 @@ class ActionBreakdownUtils:
             episode_ids = [episode_ids]
 
         wpts_array = track.center_line
+        extent = (track.outer_border[:, 0].min(), track.outer_border[:, 0].max(),
+                  track.outer_border[:, 1].min(), track.outer_border[:, 1].max())
 
         # Slice the data frame to get all episodes in selected iterations
         df_iter = df[df['iteration'].isin(iteration_ids)] if iteration_ids is not None else df
@@ -915,7 +1745,11 @@ class ActionBreakdownUtils:
             df_slice = df_iter[df_iter['action'] == idx]
             df_slice = df_slice[df_slice['reward'] >= min_reward]
 
-            ax.plot(df_slice['x'], df_slice['y'], 'b.')
+            if max_points is not None and df_slice.shape[0] > max_points:
+                # too many points to draw one by one, their density is shown instead
+                DownsamplingUtils.plot_density(ax, df_slice['x'], df_slice['y'], extent=extent)
+            else:
+                ax.plot(df_slice['x'], df_slice['y'], 'b.')
 
             if track_breakdown:
                 for idWp in track_breakdown.vert_lines:
@@ -956,5 +1790,4 @@ class ActionBreakdownUtils:
             ax.legend([action_names[idx]])
             ax.set_ylim((0, 150))
 
-        plt.show()
-        plt.clf()
+        show_figure()
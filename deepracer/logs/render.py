@@ -0,0 +1,315 @@
+"""
+Copyright 2019-2020 AWS DeepRacer Community. All Rights Reserved.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from io import BytesIO
+import hashlib
+import os
+import threading
+
+import pandas as pd
+
+_local = threading.local()
+
+
+def show_figure(fig=None, clear=True):
+    """Shows a finished figure, or hands it over to the active FigureCapture
+
+    Used by the plotting functions of deepracer.logs in place of plt.show().
+
+    Arguments:
+    fig - figure to show, default: None (current figure)
+    clear - clear the current figure after showing it, default: True
+    """
+    import matplotlib.pyplot as plt
+
+    captures = getattr(_local, "captures", None)
+    if not captures:
+        plt.show()
+        if clear:
+            plt.clf()
+        return
+
+    captures[-1].add(fig if fig is not None else plt.gcf())
+
+
+class FigureCapture:
+    """Context manager collecting figures shown by the plotting functions instead of
+    displaying them.
+
+    Each figure is saved to bytes in the requested format and closed, so capturing works
+    headlessly with the Agg backend and figures do not pile up in memory.
+
+    Example:
+    with FigureCapture(format="svg") as capture:
+        PlottingUtils.plot_track(df, track)
+    capture.images[0]
+    """
+
+    def __init__(self, format="png", dpi=100, **savefig_kwargs):
+        """Create FigureCapture object
+
+        Arguments:
+        format - image format, any format supported by matplotlib savefig, e.g. png or svg,
+            default: png
+        dpi - resolution of raster images, default: 100
+        savefig_kwargs - other arguments passed to savefig
+        """
+        self.format = format
+        self.dpi = dpi
+        self.savefig_kwargs = savefig_kwargs
+        self.images = []
+
+    def add(self, fig):
+        """Saves the figure to bytes and closes it
+
+        Arguments:
+        fig - figure to add
+        """
+        import matplotlib.pyplot as plt
+
+        buffer = BytesIO()
+        fig.savefig(buffer, format=self.format, dpi=self.dpi, **self.savefig_kwargs)
+        plt.close(fig)
+        self.images.append(buffer.getvalue())
+
+    def __enter__(self):
+        if getattr(_local, "captures", None) is None:
+            _local.captures = []
+        _local.captures.append(self)
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        _local.captures.remove(self)
+        return False
+
+
+def _plot_grid_world(df, track, ids, column, **kwargs):
+    from .log_utils import AnalysisUtils, PlottingUtils
+
+    metrics = AnalysisUtils.lap_metrics(df, column).set_index(column)
+
+    for episode, episode_df in AnalysisUtils.partition(df, column, ids):
+        if not episode_df.empty:
+            PlottingUtils.plot_grid_world(
+                episode_df, track, metrics=metrics.loc[episode], **kwargs)
+
+
+def _plot_laps(df, track, ids, column, **kwargs):
+    from .log_utils import PlottingUtils
+
+    if ids is None:
+        ids = sorted(df[column].unique())
+    PlottingUtils.plot_selected_laps(list(ids), df, track, section_to_plot=column, **kwargs)
+
+
+def _plot_track(df, track, ids, column, **kwargs):
+    from .log_utils import PlottingUtils
+
+    PlottingUtils.plot_track(df, track, **kwargs)
+
+
+def _plot_action_breakdown(df, track, ids, column, **kwargs):
+    from .log_utils import ActionBreakdownUtils
+
+    if column == "iteration":
+        ActionBreakdownUtils.action_breakdown(df, track, iteration_ids=ids, **kwargs)
+    else:
+        ActionBreakdownUtils.action_breakdown(df, track, episode_ids=ids, **kwargs)
+
+
+def _aggregates(df, is_eval=False):
+    from .log_utils import AnalysisUtils
+
+    # episode numbers restart per iteration and worker, unique_episode tells them apart
+    columns = {}
+    if 'unique_episode' in df.columns:
+        columns['episode'] = df['unique_episode']
+    if not is_eval and 'new_reward' not in df.columns:
+        columns['new_reward'] = df['reward']
+    if columns:
+        df = df.assign(**columns)
+    return AnalysisUtils.simulation_agg(df, is_eval=is_eval)
+
+
+def _plot_progress(df, track, ids, column, **kwargs):
+    from .log_utils import AnalysisUtils
+
+    AnalysisUtils.analyze_training_progress(_aggregates(df), **kwargs)
+
+
+def _plot_aggregates(df, track, ids, column, is_eval=False, **kwargs):
+    from .log_utils import AnalysisUtils
+
+    AnalysisUtils.scatter_aggregates(_aggregates(df, is_eval), is_eval=is_eval, **kwargs)
+
+
+# worker processes keep the tracks they have built, by name and hash of the waypoints
+_tracks = {}
+
+
+def _render_job(kind, df, track_key, waypoints, ids, column, kwargs, format, dpi):
+    import matplotlib
+    matplotlib.use("Agg")
+
+    from ..tracks.track_utils import Track
+
+    if track_key not in _tracks:
+        _tracks[track_key] = Track(track_key[0], waypoints)
+
+    with FigureCapture(format=format, dpi=dpi) as capture:
+        BatchRenderer.KINDS[kind](df, _tracks[track_key], ids, column, **kwargs)
+
+    return capture.images
+
+
+class BatchRenderer:
+    """Renders many figures of one log headlessly, in parallel processes.
+
+    Each job selects episodes (or iterations) of the log and a kind of plot:
+    * grid_world - PlottingUtils.plot_grid_world, one figure per episode
+    * laps - PlottingUtils.plot_selected_laps, one figure with all the selected laps
+    * track - PlottingUtils.plot_track of the selected steps
+    * action_breakdown - ActionBreakdownUtils.action_breakdown of the selected steps
+    * progress - AnalysisUtils.analyze_training_progress of the selected episodes
+    * aggregates - AnalysisUtils.scatter_aggregates of the selected episodes
+    Rows of all jobs are located in a single scan of the log and only the rows a job needs
+    are sent to the worker rendering it. Figures are rendered with the Agg backend and
+    every worker builds the track geometry once.
+
+    Example:
+    renderer = BatchRenderer(df, track, n_jobs=4)
+    renderer.render([("grid_world", [1, 2, 3]), ("laps", [4, 5])], output_dir="figures")
+    """
+
+    KINDS = {
+        "grid_world": _plot_grid_world,
+        "laps": _plot_laps,
+        "track": _plot_track,
+        "action_breakdown": _plot_action_breakdown,
+        "progress": _plot_progress,
+        "aggregates": _plot_aggregates,
+    }
+
+    def __init__(self, df, track, n_jobs=None, format="png", dpi=100):
+        """Create BatchRenderer object
+
+        Arguments:
+        df - dataframe with the steps to plot
+        track - track info for plotting
+        n_jobs - number of worker processes, as in joblib; -1 uses all cores,
+            default: None (render in this process)
+        format - image format, e.g. png or svg, default: png
+        dpi - resolution of raster images, default: 100
+        """
+        self.df = df
+        self.track = track
+        self.n_jobs = n_jobs
+        self.format = format
+        self.dpi = dpi
+
+        self._track_key = (track.name, hashlib.sha1(track.waypoints.tobytes()).hexdigest())
+
+    def render(self, jobs, output_dir=None):
+        """Renders the figures of the jobs
+
+        Arguments:
+        jobs - list of jobs, each a tuple of (kind, ids) or a dictionary with keys:
+            kind - kind of the plot, one of BatchRenderer.KINDS
+            ids - list of episodes or iterations to plot, default: None (all)
+            column - column the ids refer to, default: episode
+            name - base name of the files written, default: number and kind of the job
+            kwargs - dictionary of other arguments of the plotting function
+        output_dir - folder to write the images to, default: None (return bytes)
+
+        Returns:
+        A list with an entry per job holding the list of its images, as paths of the files
+        written if output_dir is set, as bytes otherwise
+        """
+        from joblib import Parallel, delayed
+
+        from .log_utils import AnalysisUtils
+
+        jobs = [BatchRenderer._normalize(i, job) for i, job in enumerate(jobs)]
+        for job in jobs:
+            if job["kind"] not in BatchRenderer.KINDS:
+                raise Exception("Unknown plot kind: %s" % job["kind"])
+
+        # rows of all jobs are found in one pass per column
+        slices = {}
+        for column in set(job["column"] for job in jobs):
+            ids = set()
+            for job in jobs:
+                if job["column"] == column and job["ids"] is not None:
+                    ids.update(job["ids"])
+            slices[column] = dict(AnalysisUtils.partition(self.df, column, sorted(ids)))
+
+        def job_df(job):
+            if job["ids"] is None:
+                return self.df
+            parts = [slices[job["column"]][i] for i in job["ids"]]
+            if not parts:
+                return self.df.iloc[0:0]
+            return pd.concat(parts) if len(parts) > 1 else parts[0]
+
+        if self.n_jobs is None:
+            # rendering in this process uses the track as it is and keeps the backend
+            results = []
+            for job in jobs:
+                with FigureCapture(format=self.format, dpi=self.dpi) as capture:
+                    BatchRenderer.KINDS[job["kind"]](
+                        job_df(job), self.track, job["ids"], job["column"], **job["kwargs"])
+                results.append(capture.images)
+        else:
+            results = Parallel(n_jobs=self.n_jobs)(
+                delayed(_render_job)(
+                    job["kind"], job_df(job), self._track_key, self.track.waypoints,
+                    job["ids"], job["column"], job["kwargs"], self.format, self.dpi)
+                for job in jobs
+            )
+
+        if output_dir is None:
+            return results
+
+        os.makedirs(output_dir, exist_ok=True)
+        paths = []
+        for job, images in zip(jobs, results):
+            job_paths = []
+            for i, image in enumerate(images):
+                suffix = "" if len(images) == 1 else "_%d" % i
+                path = os.path.join(output_dir, "%s%s.%s" % (job["name"], suffix, self.format))
+                with open(path, "wb") as f:
+                    f.write(image)
+                job_paths.append(path)
+            paths.append(job_paths)
+
+        return paths
+
+    @staticmethod
+    def _normalize(index, job):
+        if type(job) is not dict:
+            kind, ids = job
+            job = {"kind": kind, "ids": ids}
+
+        job = dict(job)
+        job.setdefault("ids", None)
+        job.setdefault("column", "episode")
+        job.setdefault("kwargs", {})
+        if job["ids"] is not None:
+            job["ids"] = list(job["ids"])
+        job.setdefault("name", "%03d_%s" % (index, job["kind"]))
+
+        return job
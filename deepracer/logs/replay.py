@@ -0,0 +1,262 @@
+"""
+Copyright 2019-2020 AWS DeepRacer Community. All Rights Reserved.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+import os
+
+import numpy as np
+
+from .instrumentation import instrument
+
+
+class EpisodeReplay:
+    """Replays episodes as an animation of the car moving around the track.
+
+    Each frame shows the position of the car, an arrow in the direction it is heading and
+    a trail of the recent steps, coloured by a value such as speed. Several episodes are
+    replayed side by side on the same track for comparison, episodes that have finished
+    stay at their last position.
+
+    Positions, headings and values of all frames are computed upfront, the track is drawn
+    once and frames only move the cars, so the animation can use blitting and long
+    episodes replay at full frame rate. The figure is not managed by pyplot, so saving
+    works headlessly.
+
+    Example:
+    replay = EpisodeReplay(df, track, episodes=[10, 42])
+    replay.save("replay.gif")
+    HTML(replay.animation().to_jshtml())
+    """
+
+    def __init__(self, df, track, episodes=None, column='episode', value_field='speed',
+                 heading_field=None, step=1, trail=20, fps=15, cmap='plasma',
+                 figsize=(12, 8), ax=None):
+        """Create EpisodeReplay object
+
+        Arguments:
+        df - dataframe with steps, steps of each episode in their order
+        track - track info for plotting
+        episodes - list of episodes to replay, default: None (all episodes of df)
+        column - column the episodes refer to, default: episode
+        value_field - column to colour the cars and trails by, default: speed
+        heading_field - column with heading of the car in degrees, default: None (heading
+            or yaw, whichever is in df)
+        step - number of steps the cars move per frame, default: 1
+        trail - number of recent steps drawn behind each car, default: 20
+        fps - frames per second, default: 15
+        cmap - colour map of the values, default: plasma
+        figsize - size of the figure in inches, default: (12, 8)
+        ax - axes to draw on, default: None (new figure)
+        """
+        from .log_utils import AnalysisUtils
+
+        if heading_field is None:
+            heading_field = 'heading' if 'heading' in df.columns else 'yaw'
+
+        parts = [(i, part) for i, part in AnalysisUtils.partition(df, column, episodes)
+                 if not part.empty]
+        if not parts:
+            raise Exception("No steps found for episodes: %s" % episodes)
+
+        self.track = track
+        self.episodes = [i for i, _ in parts]
+        self.step = max(1, int(step))
+        self.trail = max(0, int(trail))
+        self.fps = fps
+        self.cmap = cmap
+        self.figsize = figsize
+        self.ax = ax
+        self._scene = None
+
+        lengths = np.array([part.shape[0] for _, part in parts])
+        self.n_frames = int(np.ceil(lengths.max() / self.step))
+
+        # step shown in each frame for every episode, as rows of the concatenated steps
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        frame_steps = np.minimum(np.arange(self.n_frames)[:, None] * self.step, lengths - 1)
+        self.frame_rows = offsets + frame_steps
+
+        def values(field):
+            return np.concatenate([part[field].to_numpy(dtype=float) for _, part in parts])
+
+        self.x = values('x')
+        self.y = values('y')
+        self.values = values(value_field)
+        heading = np.radians(values(heading_field))
+        self.dx = np.cos(heading)
+        self.dy = np.sin(heading)
+        self.offsets = offsets
+        self.value_field = value_field
+
+    def animation(self):
+        """Builds the animation
+
+        Returns:
+        A matplotlib FuncAnimation, e.g. to save it or to display it with to_jshtml()
+        """
+        from matplotlib.animation import FuncAnimation
+
+        fig, init, update = self._setup()
+
+        return FuncAnimation(fig, update, frames=self.n_frames, init_func=init, blit=True,
+                             interval=1000 / self.fps)
+
+    def frames(self, dpi=100):
+        """Renders the frames of the animation one by one
+
+        The figure is drawn once, every frame then only restores it and draws the cars
+        and trails on top, as blitting does on screen.
+
+        Arguments:
+        dpi - resolution of the frames, default: 100
+
+        Returns:
+        A generator of RGBA images as numpy arrays of shape (height, width, 4)
+        """
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        fig, init, update = self._setup()
+        fig.set_dpi(dpi)
+        canvas = fig.canvas
+        if not hasattr(canvas, 'copy_from_bbox'):
+            # figures created without pyplot have no canvas able to blit yet
+            canvas = FigureCanvasAgg(fig)
+
+        init()
+        canvas.draw()
+        background = canvas.copy_from_bbox(fig.bbox)
+
+        for frame in range(self.n_frames):
+            canvas.restore_region(background)
+            for artist in update(frame):
+                artist.axes.draw_artist(artist)
+            yield np.asarray(canvas.buffer_rgba()).copy()
+
+    @instrument()
+    def save(self, path, dpi=100, writer=None):
+        """Saves the animation to a file
+
+        GIF files are written from frames() with Pillow (the replay extra), other formats
+        such as .mp4 are written with ffmpeg, which needs to be installed.
+
+        Arguments:
+        path - path of the file
+        dpi - resolution of the frames, default: 100
+        writer - matplotlib animation writer to use instead, default: None
+        """
+        from matplotlib.animation import FFMpegWriter
+
+        if writer is None and os.path.splitext(path)[1].lower() == '.gif':
+            self._save_gif(path, dpi)
+            return
+
+        if writer is None:
+            if not FFMpegWriter.isAvailable():
+                raise Exception("Saving %s requires ffmpeg, which was not found" % path)
+            writer = FFMpegWriter(fps=self.fps)
+
+        self.animation().save(path, writer=writer, dpi=dpi)
+
+    def _save_gif(self, path, dpi):
+        try:
+            from PIL import GifImagePlugin, Image
+        except ImportError:
+            raise ImportError("Saving GIF files requires Pillow, install it with "
+                              "pip install deepracer-utils[replay]")
+
+        # frames are written as they are rendered, so memory does not grow with the
+        # length of the episodes. All frames share the palette of the first one, which
+        # holds the track and the colour bar, so frames are only mapped to it
+        duration = int(round(1000 / self.fps))
+        palette = None
+        with open(path, 'wb') as f:
+            for frame in self.frames(dpi):
+                image = Image.fromarray(frame).convert('RGB')
+                if palette is None:
+                    palette = image.quantize()
+                    header, _ = GifImagePlugin.getheader(palette.copy(), info={'loop': 0})
+                    f.write(b''.join(header))
+                image = image.quantize(palette=palette, dither=Image.NONE)
+                for data in GifImagePlugin.getdata(image, duration=duration):
+                    f.write(data)
+            f.write(b';')
+
+    def _setup(self):
+        # the track and the colour bar are drawn on the axes once, later calls reuse them
+        if self._scene is None:
+            self._scene = self._draw_scene()
+        return self._scene
+
+    def _draw_scene(self):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.colors import Normalize
+        from matplotlib.figure import Figure
+
+        from .log_utils import PlottingUtils
+
+        ax = self.ax
+        if ax is None:
+            fig = Figure(figsize=self.figsize)
+            FigureCanvasAgg(fig)
+            ax = fig.add_subplot(1, 1, 1)
+        fig = ax.figure
+
+        # the static part is drawn once and restored by blitting
+        ax.set_aspect('equal')
+        PlottingUtils.print_border(ax, self.track)
+        low = self.track.outer_border.min(axis=0) - 0.5
+        high = self.track.outer_border.max(axis=0) + 0.5
+        ax.set_xlim(low[0], high[0])
+        ax.set_ylim(low[1], high[1])
+
+        norm = Normalize(np.nanmin(self.values), np.nanmax(self.values))
+        trails = [ax.plot([], [], color='grey', alpha=0.6, lw=2, animated=True)[0]
+                  for _ in self.episodes]
+        start = self.frame_rows[0]
+        cars = ax.scatter(self.x[start], self.y[start], c=self.values[start], s=80,
+                          cmap=self.cmap, norm=norm, zorder=3, animated=True)
+        arrows = ax.quiver(self.x[start], self.y[start], self.dx[start], self.dy[start],
+                           color='black', scale=30, width=0.004, zorder=4, animated=True)
+        label = ax.text(0.01, 0.99, '', transform=ax.transAxes, va='top', animated=True)
+        artists = trails + [cars, arrows, label]
+
+        fig.colorbar(cars, ax=ax, label=self.value_field)
+
+        def init():
+            for line in trails:
+                line.set_data([], [])
+            label.set_text('')
+            return artists
+
+        def update(frame):
+            rows = self.frame_rows[frame]
+            for line, offset, row in zip(trails, self.offsets, rows):
+                first = max(offset, row - self.trail)
+                line.set_data(self.x[first:row + 1], self.y[first:row + 1])
+
+            positions = np.column_stack((self.x[rows], self.y[rows]))
+            cars.set_offsets(positions)
+            cars.set_array(self.values[rows])
+            arrows.set_offsets(positions)
+            arrows.set_UVC(self.dx[rows], self.dy[rows])
+            label.set_text('step %d\n%s' % (frame * self.step, '\n'.join(
+                '%s %s: %.2f' % (episode, self.value_field, value)
+                for episode, value in zip(self.episodes, self.values[rows]))))
+
+            return artists
+
+        return fig, init, update
@@ -0,0 +1,302 @@
+"""
+Copyright 2019-2020 AWS DeepRacer Community. All Rights Reserved.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+import base64
+import hashlib
+import html
+import os
+
+import numpy as np
+import pandas as pd
+
+from .instrumentation import instrument
+from .render import BatchRenderer, _aggregates
+
+MIME_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "svg": "image/svg+xml",
+}
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>%(title)s</title>
+<style>
+body { font-family: sans-serif; margin: 2em; }
+img { max-width: 100%%; }
+table { border-collapse: collapse; font-size: small; }
+td, th { border: 1px solid #ccc; padding: 2px 6px; text-align: right; }
+</style>
+</head>
+<body>
+<h1>%(title)s</h1>
+%(body)s
+</body>
+</html>
+"""
+
+
+class TrainingReport:
+    """Builds a self-contained HTML report of a log with the usual analyses.
+
+    Figures are the kinds of BatchRenderer, rendered headlessly and optionally in
+    parallel, and embedded in the page as base64 images, so the report is a single file.
+    Tables are embedded as HTML.
+
+    With a cache_dir set, every figure is stored under a hash of the rows it is made of
+    and its parameters. Regenerating a report, e.g. after more iterations have been
+    logged, only renders figures whose data or parameters have changed.
+
+    Example:
+    report = TrainingReport(df, track, title="my-model", cache_dir="report-cache")
+    report.add_defaults()
+    report.add("grid_world", "Episode 42", ids=[42])
+    report.write("my-model.html")
+    """
+
+    def __init__(self, df, track, title="Training report", cache_dir=None, n_jobs=None,
+                 format="png", dpi=100):
+        """Create TrainingReport object
+
+        Arguments:
+        df - dataframe with the steps of the log
+        track - track info for plotting
+        title - title of the report, default: Training report
+        cache_dir - folder to cache rendered figures in, default: None (no caching)
+        n_jobs - number of processes rendering figures, as in BatchRenderer,
+            default: None (render in this process)
+        format - image format, one of png, jpg or svg, default: png
+        dpi - resolution of raster images, default: 100
+        """
+        if format not in MIME_TYPES:
+            raise Exception("Unsupported image format: %s" % format)
+
+        self.df = df
+        self.track = track
+        self.title = title
+        self.cache_dir = cache_dir
+        self.format = format
+        self.dpi = dpi
+        self.sections = []
+
+        self._renderer = BatchRenderer(df, track, n_jobs=n_jobs, format=format, dpi=dpi)
+        self._row_hashes = None
+
+    def add(self, kind, title=None, ids=None, column="episode", **kwargs):
+        """Adds a figure section
+
+        Arguments:
+        kind - kind of the figure, one of BatchRenderer.KINDS
+        title - heading of the section, default: None (the kind)
+        ids - list of episodes or iterations to plot, default: None (all)
+        column - column the ids refer to, default: episode
+        kwargs - other arguments of the plotting function, their repr is part of
+            the cache key
+
+        Returns:
+        The report, so calls can be chained
+        """
+        if kind not in BatchRenderer.KINDS:
+            raise Exception("Unknown plot kind: %s" % kind)
+
+        self.sections.append({
+            "title": title or kind,
+            "job": {"kind": kind, "ids": None if ids is None else list(ids),
+                    "column": column, "kwargs": kwargs},
+        })
+        return self
+
+    def add_table(self, title, table):
+        """Adds a table section
+
+        Arguments:
+        title - heading of the section
+        table - dataframe to show
+
+        Returns:
+        The report, so calls can be chained
+        """
+        self.sections.append({"title": title, "table": table})
+        return self
+
+    def add_defaults(self, is_eval=False, best_laps=3):
+        """Adds the standard set of sections
+
+        For training: progress per iteration with its table, episode aggregates,
+        a reward heatmap, the action breakdown and the fastest complete laps (or those
+        with most progress if no lap was completed). For evaluations: aggregates and
+        a grid world plot of every episode.
+
+        Episodes are aggregated and laps selected by unique_episode in all sections,
+        logs without it get the column, numbering the episodes of each iteration and
+        worker.
+
+        Arguments:
+        is_eval - is the log an evaluation, default: False
+        best_laps - number of best laps to plot, default: 3
+
+        Returns:
+        The report, so calls can be chained
+        """
+        from .log_utils import AnalysisUtils
+
+        if is_eval:
+            self.add("aggregates", "Aggregates", is_eval=True)
+            self.add("grid_world", "Episodes")
+            return self
+
+        # episodes are numbered per iteration and worker, so they are told apart by
+        # unique_episode, or by all three if the log has no unique_episode
+        if "unique_episode" not in self.df.columns:
+            keys = [k for k in ("iteration", "worker", "episode") if k in self.df.columns]
+            lap = self.df.groupby(keys, sort=False).ngroup()
+            self._set_df(self.df.assign(unique_episode=lap.values))
+
+        # the same aggregates as the progress and aggregates figures
+        aggregates = _aggregates(self.df)
+
+        self.add("progress", "Training progress")
+        self.add_table("Progress per iteration", AnalysisUtils.training_progress(aggregates))
+        self.add("aggregates", "Aggregates")
+        self.add("track", "Reward heatmap")
+        self.add("action_breakdown", "Action breakdown")
+
+        complete = aggregates[aggregates["progress"] == 100]
+        if complete.empty:
+            best = aggregates.nlargest(best_laps, "progress")
+        else:
+            best = complete.nsmallest(best_laps, "time")
+        self.add("laps", "Best laps", ids=best["episode"].tolist(), column="unique_episode")
+
+        return self
+
+    @instrument()
+    def render(self):
+        """Renders the figures of all sections, taking cached ones from cache_dir
+
+        Returns:
+        A list with an entry per section, the list of its images as bytes for figures
+        and None for tables
+        """
+        figures = [s for s in self.sections if "job" in s]
+        keys = [self._cache_key(s["job"]) for s in figures]
+
+        images = {}
+        if self.cache_dir is not None:
+            for key in keys:
+                if key not in images and os.path.isfile(self._cache_path(key, 0)):
+                    images[key] = self._read_cache(key)
+
+        missing = {}
+        for key, section in zip(keys, figures):
+            if key not in images:
+                missing[key] = section["job"]
+
+        if missing:
+            rendered = self._renderer.render(list(missing.values()))
+            for key, result in zip(missing, rendered):
+                images[key] = result
+                if self.cache_dir is not None:
+                    self._write_cache(key, result)
+
+        keys = iter(keys)
+        return [images[next(keys)] if "job" in s else None for s in self.sections]
+
+    @instrument()
+    def write(self, path):
+        """Renders the report and writes it to an HTML file
+
+        Arguments:
+        path - path of the file to write
+
+        Returns:
+        The path written
+        """
+        mime = MIME_TYPES[self.format]
+        body = []
+        for section, images in zip(self.sections, self.render()):
+            body.append("<h2>%s</h2>" % html.escape(str(section["title"])))
+            if images is None:
+                body.append(section["table"].to_html(float_format=lambda v: "%.3f" % v))
+                continue
+            for image in images:
+                body.append('<img src="data:%s;base64,%s">' % (
+                    mime, base64.b64encode(image).decode("ascii")))
+
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(HTML_TEMPLATE % {"title": html.escape(str(self.title)),
+                                     "body": "\n".join(body)})
+
+        return path
+
+    def _set_df(self, df):
+        self.df = df
+        self._renderer.df = df
+        self._row_hashes = None
+
+    def _cache_path(self, key, n):
+        return os.path.join(self.cache_dir, "%s_%d.%s" % (key, n, self.format))
+
+    def _read_cache(self, key):
+        """Images of a figure, from its files numbered from 0
+        """
+        images = []
+        while os.path.isfile(self._cache_path(key, len(images))):
+            with open(self._cache_path(key, len(images)), "rb") as f:
+                images.append(f.read())
+        return images
+
+    def _write_cache(self, key, images):
+        """Writes the images of a figure to files, the first one last, as it marks the
+        figure as cached
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for n in reversed(range(len(images))):
+            with open(self._cache_path(key, n), "wb") as f:
+                f.write(images[n])
+
+    def _cache_key(self, job):
+        """Hash of the rows a figure is made of and of everything else it depends on
+        """
+        from .log_utils import AnalysisUtils
+
+        # rows are hashed once, a figure hashes the hashes of its rows
+        if self._row_hashes is None:
+            self._row_hashes = pd.util.hash_pandas_object(self.df, index=False).values
+
+        if job["ids"] is None:
+            rows = self._row_hashes
+        else:
+            positions = pd.DataFrame({
+                job["column"]: self.df[job["column"]].values,
+                "position": np.arange(self.df.shape[0]),
+            })
+            parts = AnalysisUtils.partition(positions, job["column"], job["ids"])
+            rows = self._row_hashes[np.concatenate(
+                [np.empty(0, dtype=int)] + [part["position"].values for _, part in parts])]
+
+        digest = hashlib.sha1()
+        digest.update(repr((job["kind"], job["column"], job["ids"],
+                            sorted(job["kwargs"].items()), self.format, self.dpi,
+                            self._renderer._track_key, list(self.df.columns))).encode())
+        digest.update(np.ascontiguousarray(rows).tobytes())
+
+        return digest.hexdigest()
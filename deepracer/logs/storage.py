@@ -0,0 +1,141 @@
+"""
+Copyright 2019-2020 AWS DeepRacer Community. All Rights Reserved.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from io import BytesIO
+import os
+
+
+class Storage:
+    """Interface of a storage backend used to read training metrics.
+
+    Objects are addressed the S3 way, with a bucket and a key.
+    """
+
+    def open(self, bucket, key):
+        """Opens an object for reading
+
+        Arguments:
+        bucket - (str) bucket holding the object
+        key - (str) key of the object
+
+        Returns:
+        A binary file-like object supporting read() and usable as a context manager.
+        """
+        raise NotImplementedError()
+
+    def list(self, bucket, prefix=""):
+        """Lists objects under a prefix
+
+        Arguments:
+        bucket - (str) bucket holding the objects
+        prefix - (str) prefix of the keys to list. Default: "" (whole bucket)
+
+        Returns:
+        An iterator of tuples (key, size in bytes)
+        """
+        raise NotImplementedError()
+
+    def url(self, bucket, key):
+        """Describes the location of an object, used for logging
+
+        Arguments:
+        bucket - (str) bucket holding the object
+        key - (str) key of the object
+
+        Returns:
+        A string with the object location
+        """
+        raise NotImplementedError()
+
+
+class S3Storage(Storage):
+    """Storage backend reading from S3 or any S3 compatible service such as MinIO
+    """
+
+    def __init__(self, s3_endpoint_url=None, region=None, max_pool_connections=10):
+        """Creates the S3 backend
+
+        The underlying client is thread safe and shared by all reads, so objects can be
+        fetched concurrently over one connection pool.
+
+        Arguments:
+        s3_endpoint_url - (str) URL for the S3 endpoint, e.g. of a MinIO server.
+            Default: None (AWS S3)
+        region - (str) AWS Region for S3
+        max_pool_connections - (int) Size of the connection pool. Default: 10
+        """
+        import boto3
+        from botocore.config import Config
+
+        self.s3 = boto3.client(
+            "s3",
+            endpoint_url=s3_endpoint_url,
+            region_name=region,
+            config=Config(max_pool_connections=max_pool_connections)
+        )
+
+    def open(self, bucket, key):
+        bytes_io = BytesIO()
+        self.s3.download_fileobj(bucket, key, bytes_io)
+        bytes_io.seek(0)
+        return bytes_io
+
+    def list(self, bucket, prefix=""):
+        paginator = self.s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                yield obj["Key"], obj["Size"]
+
+    def url(self, bucket, key):
+        return "s3://%s/%s" % (bucket, key)
+
+
+class LocalStorage(Storage):
+    """Storage backend reading from the local filesystem
+
+    Objects are resolved to base_path/bucket/key which matches the way MinIO stores
+    its data on disk, so a DRfC data folder can be read without going through HTTP.
+    """
+
+    def __init__(self, base_path="."):
+        """Creates the local filesystem backend
+
+        Arguments:
+        base_path - (str) folder containing the buckets. Default: "."
+        """
+        self.base_path = base_path
+
+    def path(self, bucket, key):
+        """Resolves the bucket and key to a path on disk
+        """
+        return os.path.join(self.base_path, bucket, *key.split("/"))
+
+    def open(self, bucket, key):
+        return open(self.path(bucket, key), "rb")
+
+    def list(self, bucket, prefix=""):
+        bucket_path = os.path.join(self.base_path, bucket)
+        folder = os.path.join(bucket_path, *prefix.split("/")[:-1])
+        for root, _, files in os.walk(folder):
+            for name in files:
+                path = os.path.join(root, name)
+                key = os.path.relpath(path, bucket_path).replace(os.path.sep, "/")
+                if key.startswith(prefix):
+                    yield key, os.path.getsize(path)
+
+    def url(self, bucket, key):
+        return self.path(bucket, key)
@@ -0,0 +1,366 @@
+"""
+Copyright 2019-2020 AWS DeepRacer Community. All Rights Reserved.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from bisect import bisect_left, insort
+from collections import deque
+import math
+
+import numpy as np
+import pandas as pd
+
+
+def quantile_name(q):
+    """Name of a quantile used in column names, e.g. q50 for 0.5
+    """
+    return 'q%g' % (q * 100)
+
+
+class RollingStatistics:
+    """Rolling mean, rolling quantiles and exponentially weighted mean of a single series,
+    updated one value at a time.
+
+    State is limited to the last window values, the mean and exponentially weighted mean
+    are updated in constant time. Results match pandas:
+    * series.rolling(window, min_periods).mean()
+    * series.rolling(window, min_periods).quantile(q) (linear interpolation)
+    * series.ewm(alpha=alpha).mean() (adjust=True, ignore_na=False)
+    NaN values are accepted and skipped the way pandas skips them.
+    """
+
+    def __init__(self, window, quantiles=(), min_periods=None, alpha=None):
+        """Create RollingStatistics object
+
+        Arguments:
+        window - number of most recent values the rolling statistics are computed over
+        quantiles - quantiles (0-1) to compute over the window, default: none
+        min_periods - minimum number of non-NaN values in the window to produce
+            a result, default: None (same as window)
+        alpha - smoothing factor of the exponentially weighted mean, default: None
+            (no exponentially weighted mean)
+        """
+        self.window = window
+        self.quantiles = list(quantiles)
+        self.min_periods = window if min_periods is None else min_periods
+        self.alpha = alpha
+
+        self._values = deque()
+        self._sorted = []
+        self._sum = 0.0
+        self._compensation = 0.0
+
+        self._ewm_numerator = 0.0
+        self._ewm_denominator = 0.0
+
+    def update(self, value):
+        """Add the next value of the series
+
+        Arguments:
+        value - the new value
+
+        Returns:
+        A dictionary with 'mean', a 'q<percent>' entry per quantile (e.g. 'q50')
+        and 'ewm' if alpha was provided
+        """
+        value = float(value)
+        is_nan = math.isnan(value)
+
+        self._values.append(value)
+        if not is_nan:
+            self._add(value)
+            insort(self._sorted, value)
+
+        if len(self._values) > self.window:
+            removed = self._values.popleft()
+            if not math.isnan(removed):
+                self._add(-removed)
+                del self._sorted[bisect_left(self._sorted, removed)]
+
+        result = {'mean': self.mean()}
+        for q in self.quantiles:
+            result[quantile_name(q)] = self.quantile(q)
+
+        if self.alpha is not None:
+            decay = 1 - self.alpha
+            self._ewm_numerator *= decay
+            self._ewm_denominator *= decay
+            if not is_nan:
+                self._ewm_numerator += value
+                self._ewm_denominator += 1
+            result['ewm'] = self.ewm()
+
+        return result
+
+    def mean(self):
+        """Mean of the values in the window, NaN if there are fewer than min_periods
+        """
+        count = len(self._sorted)
+        if count == 0 or count < self.min_periods:
+            return float('nan')
+        return self._sum / count
+
+    def quantile(self, q):
+        """Quantile of the values in the window, NaN if there are fewer than min_periods
+        """
+        count = len(self._sorted)
+        if count == 0 or count < self.min_periods:
+            return float('nan')
+
+        position = q * (count - 1)
+        lower = int(math.floor(position))
+        upper = min(lower + 1, count - 1)
+        fraction = position - lower
+
+        return self._sorted[lower] + (self._sorted[upper] - self._sorted[lower]) * fraction
+
+    def ewm(self):
+        """Exponentially weighted mean of all values so far
+        """
+        if self._ewm_denominator == 0:
+            return float('nan')
+        return self._ewm_numerator / self._ewm_denominator
+
+    def _add(self, value):
+        # compensated summation keeps the running sum from drifting
+        y = value - self._compensation
+        t = self._sum + y
+        self._compensation = (t - self._sum) - y
+        self._sum = t
+
+
+class StreamingStatistics:
+    """Rolling and exponentially weighted statistics of several training metrics,
+    updated as new episodes or iterations arrive.
+
+    Feed it rows of AnalysisUtils.simulation_agg results (per episode) or of
+    AnalysisUtils.training_progress results (per iteration). Each update costs O(1) for
+    means and O(window) for quantiles and the state is bounded by the window, regardless
+    of how long the training has been going. Statistics of past updates are only kept
+    if asked for with keep_history.
+    """
+
+    def __init__(self, metrics=('reward', 'progress', 'time'), window=10, quantiles=(0.5,),
+                 min_periods=1, alpha=None, span=None, keep_history=False):
+        """Create StreamingStatistics object
+
+        Arguments:
+        metrics - names of the columns to track, default: reward, progress and time
+        window - size of the rolling window, default: 10
+        quantiles - rolling quantiles to compute, default: median only
+        min_periods - minimum number of values in the window to produce a result, default: 1
+        alpha - smoothing factor of the exponentially weighted mean, default: None
+        span - span of the exponentially weighted mean, alternative to alpha
+            (alpha = 2 / (span + 1)), default: None. Without alpha and span
+            no exponentially weighted mean is calculated
+        keep_history - keep the statistics of every update for dataframe(), memory then
+            grows with the number of updates, default: False
+        """
+        if span is not None:
+            alpha = 2.0 / (span + 1)
+
+        self.metrics = list(metrics)
+        self._statistics = {
+            m: RollingStatistics(window, quantiles, min_periods, alpha) for m in self.metrics
+        }
+        self._rows = [] if keep_history else None
+
+    def update(self, values):
+        """Add values of the next episode or iteration
+
+        Arguments:
+        values - a dictionary (or pandas Series) with a value for every tracked metric
+
+        Returns:
+        A dictionary with updated statistics, keys being <metric>_<statistic>,
+        e.g. reward_mean, progress_q50, time_ewm
+        """
+        row = {}
+        for m, statistics in self._statistics.items():
+            for name, value in statistics.update(values[m]).items():
+                row['%s_%s' % (m, name)] = value
+
+        if self._rows is not None:
+            self._rows.append(row)
+
+        return row
+
+    def update_frame(self, df):
+        """Add values of several episodes or iterations
+
+        Arguments:
+        df - dataframe with a column for every tracked metric
+
+        Returns:
+        A dataframe with statistics after each of the rows, with the index of df
+        """
+        rows = [self.update(dict(zip(self.metrics, values)))
+                for values in df[self.metrics].itertuples(index=False, name=None)]
+
+        return pd.DataFrame(rows, index=df.index)
+
+    def dataframe(self):
+        """All statistics calculated so far, available with keep_history only
+
+        Returns:
+        A dataframe with one row per update
+        """
+        if self._rows is None:
+            raise Exception("History is not kept, create StreamingStatistics with "
+                            "keep_history=True or collect the results of update()")
+        return pd.DataFrame(self._rows)
+
+
+class QuantileSketch:
+    """Compact, mergeable sketch of a distribution for approximate quantiles.
+
+    A t-digest: values are summarised by at most about compression / 2 weighted centroids,
+    small near the tails and larger around the median, which keeps the error of extreme
+    quantiles such as p99 low. Memory does not grow with the number of values.
+    Sketches built separately, e.g. per worker or per file, can be merged and the result
+    is as accurate as a sketch built from all the values at once.
+    """
+
+    def __init__(self, compression=200):
+        """Create QuantileSketch object
+
+        Arguments:
+        compression - accuracy parameter; higher values keep more centroids and give more
+            accurate results, default: 200
+        """
+        self.compression = compression
+        self.count = 0
+        self.min = float('nan')
+        self.max = float('nan')
+
+        self._means = np.empty(0)
+        self._weights = np.empty(0)
+        self._buffer = []
+        self._buffered = 0
+
+    @staticmethod
+    def from_values(values, compression=200):
+        """Create a sketch of values
+
+        Arguments:
+        values - values to summarise, non-finite values are skipped
+        compression - accuracy parameter, default: 200
+
+        Returns:
+        A QuantileSketch
+        """
+        sketch = QuantileSketch(compression)
+        sketch.update(values)
+        return sketch
+
+    def update(self, values):
+        """Add values to the sketch, non-finite values are skipped
+
+        Arguments:
+        values - a single value or an array of values
+        """
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[np.isfinite(values)]
+        if values.shape[0] == 0:
+            return
+
+        self.count += values.shape[0]
+        self.min = np.fmin(self.min, values.min())
+        self.max = np.fmax(self.max, values.max())
+
+        self._buffer.append(values)
+        self._buffered += values.shape[0]
+        if self._buffered > 5 * self.compression:
+            self._compress()
+
+    def merge(self, other):
+        """Merge another sketch into this one
+
+        Arguments:
+        other - QuantileSketch to merge
+
+        Returns:
+        This sketch
+        """
+        other._compress()
+        if other.count == 0:
+            return self
+
+        self.count += other.count
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+
+        self._compress(other._means, other._weights)
+
+        return self
+
+    def quantile(self, q):
+        """Approximate quantile
+
+        Arguments:
+        q - quantile (0-1) or an array of quantiles
+
+        Returns:
+        Approximate value of the quantile, NaN if the sketch is empty
+        """
+        self._compress()
+        if self.count == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else float('nan')
+
+        # ranks are counted like in linear interpolation of exact quantiles, so that
+        # a sketch of few values, holding every value in its own centroid, is exact
+        centers = np.cumsum(self._weights) - (self._weights + 1) / 2
+        positions = np.concatenate(([0], centers, [self.count - 1]))
+        values = np.concatenate(([self.min], self._means, [self.max]))
+
+        result = np.interp(np.asarray(q, dtype=float) * (self.count - 1), positions, values)
+        return result if np.ndim(q) else float(result)
+
+    def centroids(self):
+        """Centroids of the sketch
+
+        Returns:
+        A tuple of arrays of centroid means and weights
+        """
+        self._compress()
+        return self._means, self._weights
+
+    def _compress(self, means=None, weights=None):
+        parts_means = [self._means] + self._buffer
+        parts_weights = [self._weights] + [np.ones(b.shape[0]) for b in self._buffer]
+        if means is not None:
+            parts_means.append(means)
+            parts_weights.append(weights)
+
+        self._buffer = []
+        self._buffered = 0
+
+        all_means = np.concatenate(parts_means)
+        if all_means.shape[0] == self._means.shape[0] and means is None:
+            return
+
+        all_weights = np.concatenate(parts_weights)
+        order = np.argsort(all_means, kind='mergesort')
+        all_means = all_means[order]
+        all_weights = all_weights[order]
+
+        # centroids are merged while they fit within one unit of the k1 scale function
+        total = all_weights.sum()
+        q = (np.cumsum(all_weights) - all_weights / 2) / total
+        k = np.floor(self.compression / (2 * np.pi) * np.arcsin(2 * q - 1))
+
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(k)) + 1))
+        self._weights = np.add.reduceat(all_weights, starts)
+        self._means = np.add.reduceat(all_means * all_weights, starts) / self._weights
@@ -18,10 +18,6 @@ SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 import numpy as np
 
-# Shapely Library
-from shapely.geometry import Polygon
-from shapely.geometry.polygon import LineString
-
 # os tools to list things
 from os import listdir
 from os.path import isfile, join
@@ -200,6 +196,11 @@ class Track:
     inner_border - waypoints along the inner border of the track with coordinates in meters
     outer_border - waypoints along the outer border of the track with coordinates in meters
     road_poly - a polygon representing the track
+    border_lines - list of the center line, inner and outer border as float arrays,
+        ready to draw as a single LineCollection
+    border_points - all points of border_lines in one array
+    background_cache - images of the track rendered by PlottingUtils.track_background,
+        by rendering parameters
     """
 
     def __init__(self, name, waypoints):
@@ -215,6 +216,14 @@ class Track:
         self.inner_border = waypoints[:, 2:4]
         self.outer_border = waypoints[:, 4:6]
 
+        self.border_lines = [np.ascontiguousarray(line, dtype=float)
+                             for line in (self.center_line, self.inner_border, self.outer_border)]
+        self.border_points = np.concatenate(self.border_lines)
+        self.background_cache = {}
+
+        from shapely.geometry import Polygon
+        from shapely.geometry.polygon import LineString
+
         l_inner_border = LineString(waypoints[:, 2:4])
         l_outer_border = LineString(waypoints[:, 4:6])
         self.road_poly = Polygon(
@@ -47,6 +47,7 @@ setup(
     extras_require={
         'dev': ['check-manifest'],
         'test': ['coverage'],
+        'replay': ['Pillow>=6.2.0'],
     },
     project_urls={
         'Bug Reports':
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from deepracer.tracks import Track
+
+
+@pytest.fixture
+def track():
+    angles = np.linspace(0, 2 * np.pi, 41)
+    ellipse = [np.column_stack((r * np.cos(angles), r * np.sin(angles) / 2))
+               for r in (3.0, 2.5, 3.5)]
+    return Track("oval", np.hstack(ellipse))
+
+
+@pytest.fixture
+def steps_df():
+    rng = np.random.RandomState(0)
+    episodes = np.repeat(np.arange(6), 30)
+    angles = np.tile(np.linspace(0, 2 * np.pi, 30), 6)
+    return pd.DataFrame({
+        "iteration": episodes // 3,
+        "episode": episodes,
+        "steps": np.tile(np.arange(1, 31), 6),
+        "x": 3 * np.cos(angles),
+        "y": 1.5 * np.sin(angles),
+        "speed": rng.uniform(1, 3, 180),
+        "reward": rng.uniform(0, 1, 180),
+        "progress": np.tile(np.linspace(3, 100, 30), 6),
+        "closest_waypoint": np.tile(np.arange(30), 6),
+        "tstamp": 1600000000 + np.arange(180) / 15,
+    })
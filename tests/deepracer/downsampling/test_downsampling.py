@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+from deepracer.logs import DownsamplingUtils
+
+
+class TestDownsamplingUtils:
+    def test_lttb_keeps_shape(self):
+        x = np.arange(1000, dtype=float)
+        y = np.zeros(1000)
+        y[500] = 10
+
+        selected = DownsamplingUtils.lttb(x, y, 20)
+
+        assert len(selected) == 20
+        assert selected[0] == 0 and selected[-1] == 999
+        assert 500 in selected
+        assert np.all(np.diff(selected) > 0)
+
+    def test_lttb_small_inputs(self):
+        assert list(DownsamplingUtils.lttb([1, 2, 3], [1, 2, 3], 10)) == [0, 1, 2]
+        assert list(DownsamplingUtils.lttb(np.arange(10), np.arange(10), 2)) == [0, 9]
+
+    def test_lttb_frame(self):
+        df = pd.DataFrame({
+            "episode": np.repeat([0, 1], [3000, 1000]),
+            "x": np.cos(np.linspace(0, 20, 4000)),
+            "y": np.sin(np.linspace(0, 20, 4000)),
+            "speed": np.arange(4000),
+        })
+
+        assert DownsamplingUtils.lttb_frame(df, None) is df
+        assert DownsamplingUtils.lttb_frame(df, 5000) is df
+
+        result = DownsamplingUtils.lttb_frame(df, 400)
+        assert result["episode"].value_counts().to_dict() == {0: 300, 1: 100}
+        assert result["speed"].is_monotonic_increasing
+        assert {0, 2999, 3000, 3999} <= set(result["speed"])
+
+    def test_lttb_frame_bounded(self):
+        # many short episodes, together with more rows than max_points
+        df = pd.DataFrame({
+            "episode": np.repeat(np.arange(200), 10),
+            "x": np.cos(np.linspace(0, 20, 2000)),
+            "y": np.sin(np.linspace(0, 20, 2000)),
+        })
+
+        for max_points in [1000, 600, 250, 100]:
+            result = DownsamplingUtils.lttb_frame(df, max_points)
+            assert len(result) <= max_points
+
+        assert (DownsamplingUtils.lttb_frame(df, 600)["episode"].value_counts() == 3).all()
+        assert len(DownsamplingUtils.lttb_frame(df, 1000)) == 1000
+
+    def test_density(self):
+        rng = np.random.RandomState(0)
+        x = rng.uniform(0, 4, 10000)
+        y = rng.uniform(0, 2, 10000)
+        x[0] = np.nan
+
+        image, extent = DownsamplingUtils.density(x, y, bins=40, extent=(0, 4, 0, 2))
+
+        assert image.shape == (20, 40)
+        assert extent == (0, 4, 0, 2)
+        assert image.sum() == 9999
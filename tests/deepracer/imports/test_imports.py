@@ -0,0 +1,37 @@
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ["matplotlib", "shapely", "boto3", "botocore", "joblib", "sklearn"]
+
+
+def imported_modules(statement):
+    code = "import sys; %s; print(' '.join(sorted(sys.modules)))" % statement
+    output = subprocess.check_output([sys.executable, "-c", code])
+    return {m.split(".")[0] for m in output.decode().split()}
+
+
+class TestImports:
+    def test_package_import_is_light(self):
+        modules = imported_modules("import deepracer")
+
+        assert "pandas" not in modules
+        assert "numpy" not in modules
+        assert modules.isdisjoint(HEAVY_MODULES)
+
+    @pytest.mark.parametrize("statement", [
+        "import deepracer.__main__",
+        "from deepracer.logs import AnalysisUtils, DeepRacerLog, SimulationLogsIO, "
+        "TrainingMetrics",
+        "from deepracer.tracks import Track, TrackIO",
+    ])
+    def test_heavy_dependencies_not_imported(self, statement):
+        assert imported_modules(statement).isdisjoint(HEAVY_MODULES)
+
+    def test_subpackages_loaded_on_access(self):
+        modules = imported_modules(
+            "import deepracer; deepracer.logs.AnalysisUtils; deepracer.tracks.Track")
+
+        assert {"deepracer", "pandas"} <= modules
+        assert "matplotlib" not in modules
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from deepracer.logs import AnalysisUtils, Instrumentation
+
+
+@pytest.fixture
+def instrumentation():
+    Instrumentation.reset()
+    yield Instrumentation
+    Instrumentation.disable()
+    Instrumentation.reset()
+
+
+@pytest.fixture
+def steps_df():
+    episodes = np.repeat(np.arange(20), 10)
+    return pd.DataFrame({
+        "iteration": episodes // 5,
+        "episode": episodes,
+        "steps": np.tile(np.arange(1, 11), 20),
+        "closest_waypoint": np.arange(200) % 50,
+        "progress": np.tile(np.arange(10, 110, 10), 20).astype(float),
+        "tstamp": np.arange(200) / 15.0,
+        "speed": np.ones(200),
+        "reward": np.ones(200),
+        "new_reward": np.ones(200),
+    })
+
+
+class TestInstrumentation:
+    def test_disabled_records_nothing(self, instrumentation, steps_df):
+        AnalysisUtils.simulation_agg(steps_df)
+
+        with Instrumentation.span("outside") as span:
+            span.add(rows=10)
+
+        assert Instrumentation.records() == []
+        assert Instrumentation.report().empty
+
+    def test_spans(self, instrumentation, steps_df):
+        records = []
+
+        with Instrumentation.session(trace_memory=True, callback=records.append):
+            with Instrumentation.span("outer") as span:
+                result = AnalysisUtils.simulation_agg(steps_df)
+                AnalysisUtils.training_progress(result)
+                span.add(rows=1, bytes_read=100)
+                span.add(rows=2)
+
+        assert not Instrumentation.enabled
+        assert [r["name"] for r in records] == [
+            "AnalysisUtils.simulation_agg", "AnalysisUtils.training_progress", "outer"]
+        assert records == Instrumentation.records()
+
+        report = Instrumentation.report()
+        assert list(report["name"]) == [
+            "outer", "AnalysisUtils.simulation_agg", "AnalysisUtils.training_progress"]
+        assert list(report["parent"]) == [None, "outer", "outer"]
+        assert list(report["depth"]) == [0, 1, 1]
+        assert list(report["rows"]) == [3, 200, 20]
+        assert report["bytes_read"].iloc[0] == 100
+        assert (report["duration"] >= 0).all()
+        assert (report["memory_peak"] > 0).all()
+        assert report["memory_peak"].iloc[0] >= report["memory_peak"].iloc[1:].max()
+
+    def test_summary_and_errors(self, instrumentation, steps_df):
+        Instrumentation.enable()
+        AnalysisUtils.simulation_agg(steps_df)
+        AnalysisUtils.simulation_agg(steps_df)
+        with pytest.raises(ValueError):
+            with Instrumentation.span("failing"):
+                raise ValueError()
+
+        summary = Instrumentation.report(summary=True)
+        assert summary.loc["AnalysisUtils.simulation_agg", "count"] == 2
+        assert summary.loc["AnalysisUtils.simulation_agg", "rows"] == 400
+        assert Instrumentation.records()[-1]["error"] == "ValueError"
+        assert Instrumentation.report()["memory_peak"].isna().all()
@@ -0,0 +1,165 @@
+import json
+
+import pandas as pd
+import pytest
+
+from deepracer.logs import LocalStorage, TrainingMetrics
+
+
+def metrics_json(iterations, episodes_per_iteration=4, evaluations=2):
+    metrics = []
+    episode = 0
+    for _ in range(iterations):
+        for trial in range(1, episodes_per_iteration + 1):
+            episode += 1
+            complete = episode % 2 == 0
+            metrics.append({
+                "reward_score": float(episode),
+                "metric_time": 1600000000000 + episode,
+                "start_time": 1600000000000 + episode,
+                "elapsed_time_in_milliseconds": 10000,
+                "episode": episode,
+                "trial": trial,
+                "phase": "training",
+                "completion_percentage": 100 if complete else 50,
+                "episode_status": "Lap complete" if complete else "Off track"
+            })
+        for trial in range(1, evaluations + 1):
+            metrics.append({
+                "reward_score": 0.0,
+                "metric_time": 1600000000000 + episode,
+                "start_time": 1600000000000 + episode,
+                "elapsed_time_in_milliseconds": 20000,
+                "episode": episode,
+                "trial": trial,
+                "phase": "evaluation",
+                "completion_percentage": 100,
+                "episode_status": "Lap complete"
+            })
+    return {"metrics": metrics}
+
+
+def rounds_frame(tm):
+    df = pd.DataFrame({
+        "round": [1] * 6 + [2] * 3,
+        "iteration": [0, 0, 0, 1, 1, 1, 0, 0, 0],
+        "episode": [1, 2, 2, 3, 4, 4, 1, 2, 2],
+        "phase": ["training", "training", "evaluation"] * 3,
+        "reward": [1.0, 3.0, 0.0, 5.0, 7.0, 0.0, 2.0, 4.0, 0.0],
+        "completion": [50, 100, 100] * 3,
+        "time": [10.0, 10.0, 20.0] * 3,
+        "complete": [0, 1, 1] * 3,
+    })
+    tm._addKeys(df)
+    return df
+
+
+@pytest.fixture
+def bucket(tmp_path):
+    for model, iterations in [("model-a", 3), ("model-b", 2)]:
+        folder = tmp_path / "bucket" / model / "metrics"
+        folder.mkdir(parents=True)
+        (folder / "TrainingMetrics.json").write_text(json.dumps(metrics_json(iterations)))
+    return tmp_path
+
+
+class TestTrainingMetrics:
+    def test_keys(self):
+        tm = TrainingMetrics("bucket")
+        df = pd.DataFrame({"round": [1, 1, 2, 1], "iteration": [0, 12, 3, 0],
+                           "episode": [1, 250, 80, 2]})
+        tm._addKeys(df)
+
+        assert df["r-i"].dtype == "category"
+        assert list(df["r-i"]) == ["01-000", "01-012", "02-003", "01-000"]
+        assert list(df["r-i"].cat.categories) == ["01-000", "01-012", "02-003"]
+        assert list(df["r-e"]) == ["1-0001", "1-0250", "2-0080", "1-0002"]
+
+    def test_summary_cache(self):
+        tm = TrainingMetrics("bucket")
+        tm.metrics = rounds_frame(tm)
+
+        summary = tm.getSummary()
+        assert list(summary.index.get_level_values(0)) == ["01-000", "01-001", "02-000"]
+        assert list(summary["train_reward"]) == [2.0, 6.0, 3.0]
+        assert list(summary["train_episodes"]) == [2] * 3
+        assert list(summary["eval_time"]) == [20.0] * 3
+
+        # summaries are cached, callers get copies
+        summary["train_reward"] = 0
+        assert list(tm.getSummary()["train_reward"]) == [2.0, 6.0, 3.0]
+        both = tm.getSummary(method=["mean", "max"], rounds=[1])
+        assert list(both["max"]["train_reward"]) == [3.0, 7.0]
+        assert len(tm._summary_cache) == 2
+
+    def test_load_local(self, bucket):
+        tm = TrainingMetrics("bucket", model_name="model-a", storage=LocalStorage(str(bucket)))
+
+        assert tm.metrics.shape[0] == 18
+        assert list(tm.metrics["r-i"].cat.categories) == ["01-000", "01-001", "01-002"]
+        assert tm.metrics["complete"].sum() == 6 + 6
+        assert tm.metrics["start_time"].iloc[0] == pd.Timestamp(1600000000001, unit="ms")
+        assert tm.s3 is None
+
+    def test_summary(self, bucket):
+        tm = TrainingMetrics("bucket", model_name="model-a", storage=LocalStorage(str(bucket)))
+        tm.addRound("model-b", training_round=2)
+
+        summary = tm.getSummary()
+        assert summary.shape == (5, 10)
+        assert list(summary.index.get_level_values(0)) == \
+            ["01-000", "01-001", "01-002", "02-000", "02-001"]
+        assert list(summary["train_episodes"]) == [4] * 5
+        assert list(summary["train_completed"]) == [0.5] * 5
+        assert list(summary["eval_time"]) == [20.0] * 5
+
+        both = tm.getSummary(method=["mean", "max"], rounds=[2])
+        assert list(both["max"]["train_reward"]) == [4.0, 8.0]
+        assert list(both["mean"]["train_reward"]) == [2.5, 6.5]
+
+    def test_load_many(self, bucket):
+        tm = TrainingMetrics.load_many(
+            "bucket", {"a": ["model-a"], "ab": ["model-a", ("model-b", 1)]},
+            storage=LocalStorage(str(bucket)))
+
+        assert list(tm.metrics["model"].cat.categories) == ["a", "ab"]
+        assert tm.metrics.groupby("model")["master_iteration"].max().tolist() == [2, 4]
+
+        summary = tm.getSummary()
+        assert summary.index.names == ["model", "r-i", "iteration"]
+        assert summary.shape == (8, 10)
+
+    def test_plot_progress_many(self, bucket):
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
+        tm = TrainingMetrics.load_many(
+            "bucket", ["model-a", "model-b"], storage=LocalStorage(str(bucket)))
+        tm.plotProgress()
+
+        ax = plt.gcf().axes[0]
+        plt.gcf().canvas.draw()
+        assert [t.get_text() for t in ax.get_xticklabels()] == ["01-000", "01-001", "01-002"]
+        assert sorted(line.get_label() for line in ax.get_lines()) == [
+            "Evaluation (model-a)", "Evaluation (model-b)",
+            "Training (model-a)", "Training (model-b)"]
+        plt.close("all")
+
+    def test_discover(self, bucket):
+        folder = bucket / "bucket" / "model-b" / "metrics"
+        (folder / "TrainingMetrics_1.json").write_text(json.dumps(metrics_json(2)))
+        (folder / "TrainingMetrics_3.json").write_text(json.dumps(metrics_json(2)))
+        (bucket / "bucket" / "model-c" / "metrics").mkdir(parents=True)
+        (bucket / "bucket" / "model-c" / "metrics" / "TrainingMetrics.json").write_text("")
+
+        storage = LocalStorage(str(bucket))
+        assert TrainingMetrics.discover("bucket", storage=storage) == \
+            {"model-a": 1, "model-b": 2}
+        assert TrainingMetrics.discover("bucket", "model-b/", storage=storage) == \
+            {"model-b": 2}
+        with pytest.raises(ValueError, match="two {} placeholders"):
+            TrainingMetrics.discover("bucket", pattern="{}/metrics.json", storage=storage)
+
+        tm = TrainingMetrics.load_prefix("bucket", storage=storage)
+        assert tm.metrics.groupby("model")["worker"].nunique().tolist() == [1, 2]
@@ -0,0 +1,336 @@
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from deepracer.logs import AnalysisUtils, EpisodeAggregates, FigureCapture, PlottingUtils
+
+
+@pytest.fixture
+def steps_df():
+    rows = []
+    tstamp = Decimal("1600000000.0000")
+    for episode in range(10):
+        length = 5 + episode % 3
+        for step in range(1, length + 1):
+            tstamp += Decimal("0.0667")
+            rows.append({
+                "iteration": episode // 4 + 1,
+                "episode": episode,
+                "steps": step,
+                "x": float(step),
+                "y": float(episode),
+                "speed": float(1 + step % 3),
+                "reward": float(step) / 10,
+                "done": int(step == length),
+                "progress": min(100.0, step * (10.0 + 4 * episode)),
+                "closest_waypoint": (episode * 7 + step) % 50,
+                "tstamp": tstamp,
+                "episode_status": "lap_complete" if step == length else "in_progress",
+            })
+    return pd.DataFrame(rows)
+
+
+class TestAnalysisUtils:
+    def test_simulation_agg(self, steps_df):
+        result = AnalysisUtils.simulation_agg(steps_df, add_tstamp=True)
+
+        assert list(result.columns) == [
+            "iteration", "episode", "steps", "start_at", "progress", "time", "new_reward",
+            "speed", "reward", "time_if_complete", "reward_if_complete", "quintile", "tstamp"]
+        assert list(result["steps"]) == [5, 6, 7] * 3 + [5]
+        assert list(result["start_at"]) == [(e * 7 + 1) % 50 for e in range(10)]
+        assert np.allclose(result["time"], (result["steps"] - 1) * 0.0667)
+        assert np.allclose(result["reward"], result["steps"] * (result["steps"] + 1) / 20)
+        assert np.allclose(result["speed"], steps_df.groupby("episode")["speed"].mean())
+        assert result["tstamp"].iloc[-1] == \
+            pd.to_datetime(float(steps_df["tstamp"].max()), unit="s")
+        # Decimal timestamps are converted once, in the frame itself
+        assert steps_df["tstamp"].dtype == float
+
+    def test_simulation_agg_eval(self, steps_df):
+        result = AnalysisUtils.simulation_agg(steps_df, firstgroup="iteration", is_eval=True)
+
+        assert list(result.columns) == [
+            "iteration", "episode", "steps", "start_at", "progress", "time", "speed",
+            "time_if_complete"]
+        assert np.allclose(result["time_if_complete"], result["time"] * 100 / result["progress"])
+
+    def test_simulation_agg_segments(self, steps_df):
+        steps_df.loc[3, "speed"] = np.nan
+        expected = AnalysisUtils.simulation_agg(steps_df, add_tstamp=True)
+
+        pd.testing.assert_frame_equal(
+            expected, AnalysisUtils.simulation_agg(steps_df, add_tstamp=True, engine="segments"))
+
+        shuffled = steps_df.sample(frac=1, random_state=0)
+        pd.testing.assert_frame_equal(
+            AnalysisUtils.simulation_agg(shuffled, add_tstamp=True),
+            AnalysisUtils.simulation_agg(shuffled, add_tstamp=True, engine="segments"))
+
+    def test_segments_first_skips_nan(self, steps_df):
+        # first steps of episodes 0 and 1 have no waypoint, like pandas first() the
+        # next known one is used
+        steps_df["closest_waypoint"] = steps_df["closest_waypoint"].astype(float)
+        steps_df.loc[[0, 5, 6], "closest_waypoint"] = np.nan
+
+        expected = AnalysisUtils.simulation_agg(steps_df)
+        pd.testing.assert_frame_equal(
+            expected, AnalysisUtils.simulation_agg(steps_df, engine="segments"))
+        assert list(expected["start_at"].iloc[:2]) == [2, 10]
+
+        values = np.array([np.nan, np.nan, 1.0, np.nan, 2.0])
+        result = AnalysisUtils._reduce_segments(values, np.array([0, 2, 3]), "first")
+        assert np.array_equal(result, [np.nan, 1.0, 2.0], equal_nan=True)
+
+    def test_simulation_agg_partitioned(self, steps_df):
+        steps_df["stream"] = np.where(steps_df["episode"] % 3 == 0, "b", "a")
+
+        pd.testing.assert_frame_equal(
+            AnalysisUtils.simulation_agg(steps_df, "stream", add_tstamp=True),
+            AnalysisUtils.simulation_agg(steps_df, "stream", add_tstamp=True, n_jobs=2))
+
+        empty = AnalysisUtils._aggregate_partitioned(
+            steps_df.iloc[:0], ["stream", "episode"], {"steps": ("steps", "max")}, 2)
+        assert empty.empty
+        assert list(empty.columns) == ["stream", "episode", "steps"]
+
+    def test_simulation_agg_partitioned_null_keys(self, steps_df):
+        steps_df["stream"] = np.where(steps_df["episode"] % 3 == 0, "b", "a")
+        steps_df.loc[steps_df["episode"] == 4, "stream"] = None
+        steps_df["episode"] = steps_df["episode"].astype(float)
+        steps_df.loc[[7, 20], "episode"] = np.nan
+
+        expected = AnalysisUtils.simulation_agg(steps_df, "stream")
+        assert expected.shape[0] == 9
+
+        pd.testing.assert_frame_equal(
+            expected, AnalysisUtils.simulation_agg(steps_df, "stream", n_jobs=2))
+
+    def test_training_progress(self, steps_df):
+        aggregates = AnalysisUtils.simulation_agg(steps_df)
+        before = aggregates.copy()
+
+        stats = AnalysisUtils.training_progress(aggregates)
+
+        pd.testing.assert_frame_equal(before, aggregates)
+        assert list(stats["iteration"]) == [1, 2, 3]
+        assert list(stats["episodes"]) == [4, 4, 2]
+        assert list(stats["completed"]) == list(
+            (aggregates["progress"] == 100).groupby(aggregates["iteration"]).sum())
+        assert np.allclose(
+            stats["reward_std"], aggregates.groupby("iteration")["reward"].std())
+        complete = aggregates[aggregates["progress"] == 100].groupby("iteration")["time"]
+        assert np.allclose(
+            stats.set_index("iteration")["complete_time_max"].dropna(), complete.max())
+
+    def test_iteration_quantiles(self, steps_df):
+        aggregates = AnalysisUtils.simulation_agg(steps_df)
+
+        exact = AnalysisUtils.iteration_quantiles(aggregates, quantiles=[0.5, 0.9])
+        approximate = AnalysisUtils.iteration_quantiles(
+            aggregates, quantiles=[0.5, 0.9], approximate=True)
+
+        assert list(exact.columns) == [
+            "time_if_complete_q50", "time_if_complete_q90", "progress_q50", "progress_q90"]
+        assert np.allclose(
+            exact["progress_q50"], aggregates.groupby("iteration")["progress"].median())
+        # with few values per iteration the sketch keeps every value
+        pd.testing.assert_frame_equal(exact, approximate)
+
+        halves = [AnalysisUtils.quantile_sketches(aggregates.iloc[i::2]) for i in range(2)]
+        merged = AnalysisUtils.iteration_quantiles(
+            quantiles=[0.5, 0.9], sketches=AnalysisUtils.merge_quantile_sketches(*halves))
+        pd.testing.assert_frame_equal(exact, merged)
+
+
+class TestEpisodeAggregates:
+    def test_matches_simulation_agg(self, steps_df):
+        aggregates = EpisodeAggregates(add_tstamp=True)
+        for start in range(0, steps_df.shape[0], 13):
+            aggregates.append(steps_df.iloc[start:start + 13])
+            expected = AnalysisUtils.simulation_agg(
+                steps_df.iloc[:start + 13].copy(), add_tstamp=True)
+            pd.testing.assert_frame_equal(expected, aggregates.dataframe())
+
+        assert aggregates._open.shape[0] == 0
+
+
+class TestPlottingUtils:
+    @pytest.fixture
+    def positions_df(self):
+        rng = np.random.RandomState(0)
+        return pd.DataFrame({
+            "x": rng.uniform(-5, 5, 2000),
+            "y": rng.uniform(-3, 3, 2000),
+            "reward": rng.uniform(0, 10, 2000),
+        })
+
+    def test_rasterize_last(self, track, positions_df):
+        image = PlottingUtils.rasterize(positions_df, track, resolution=10)
+
+        expected = np.zeros((image.shape[0], image.shape[1]))
+        x0, y0 = track.outer_border.min(axis=0)
+        for row in positions_df.itertuples():
+            x = min(max(int((row.x - x0 + 1) * 10), 0), image.shape[1] - 1)
+            y = min(max(int((row.y - y0 + 1) * 10), 0), image.shape[0] - 1)
+            expected[y, x] = row.reward
+
+        assert image.shape == (55, 90)
+        assert np.array_equal(image, expected)
+
+    @pytest.mark.parametrize("how", ["max", "mean", "sum", "count"])
+    def test_rasterize_reductions(self, track, positions_df, how):
+        positions_df.loc[5, "reward"] = np.nan
+        image = PlottingUtils.rasterize(positions_df, track, margin=0, resolution=4, how=how)
+
+        x0, y0 = track.outer_border.min(axis=0)
+        df = positions_df if how == "count" else positions_df.dropna()
+        columns = ((df["x"] - x0) * 4).astype(int).clip(0, image.shape[1] - 1)
+        rows = ((df["y"] - y0) * 4).astype(int).clip(0, image.shape[0] - 1)
+        expected = df.groupby([rows, columns])["reward"].agg("size" if how == "count" else how)
+
+        assert image.sum() > 0
+        assert np.allclose(image[expected.index.get_level_values(0),
+                                 expected.index.get_level_values(1)], expected)
+        assert np.count_nonzero(image) == np.count_nonzero(expected)
+
+    def test_print_border(self, track):
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
+        _, ax = plt.subplots()
+        PlottingUtils.print_border(ax, track)
+
+        assert len(ax.collections) == 1
+        assert len(ax.lines) == 1
+        assert len(ax.collections[0].get_segments()) == 3
+        plt.close("all")
+
+    def test_track_background(self, track):
+        background = PlottingUtils.track_background(track, resolution=10)
+
+        assert background.shape == (55, 90, 4)
+        assert background is PlottingUtils.track_background(track, resolution=10)
+        assert background is not PlottingUtils.track_background(track, resolution=20)
+
+        # the outer border crosses the bottom edge of the track area at x = 0
+        x0, y0 = track.outer_border.min(axis=0)
+        x, y = (np.array([0, -1.75]) - [x0, y0] + 1) * 10
+        assert background[int(y) - 2:int(y) + 3, int(x) - 2:int(x) + 3, 3].max() > 0
+        assert background[:5, :5, 3].max() == 0
+
+    def test_lap_montage(self, track):
+        laps_df = pd.DataFrame({
+            "episode": [1, 1, 2],
+            "x": [0.0, 1.0, 3.0],
+            "y": [-1.75, -1.75, 0.0],
+            "speed": [1.0, 2.0, 3.0],
+        })
+
+        image = PlottingUtils.lap_montage([2, 7, 1], laps_df, track, columns=2,
+                                          resolution=10, point_size=0)
+
+        assert image.shape == (110, 180, 3)
+        assert image.dtype == np.uint8
+        # unused tile stays white, missing lap shows only the track
+        assert (image[55:, 90:] == 255).all()
+        background = image[:55, 90:]
+        assert (background != 255).any()
+        assert np.count_nonzero((image[55:, :90] != background).any(axis=2)) == 2
+
+        # step of lap 2 at (3, 0), in the tile on the top left
+        x0, y0 = track.outer_border.min(axis=0)
+        column, row = int((3 - x0 + 1) * 10), 54 - int((0 - y0 + 1) * 10)
+        assert list(image[row, column]) == [0, 0, 255]
+        assert np.count_nonzero((image[:55, :90] != background).any(axis=2)) == 1
+
+        colored = PlottingUtils.lap_montage([1], laps_df, track, resolution=10,
+                                            value_field="speed", point_size=1)
+        assert np.count_nonzero((colored[:, :90] != background).any(axis=2)) > 2
+
+    def test_montage_without_laps(self, track):
+        import matplotlib
+        matplotlib.use("Agg")
+
+        laps_df = pd.DataFrame({"episode": [1], "x": [0.0], "y": [-1.75]})
+        with FigureCapture() as capture:
+            PlottingUtils.plot_selected_laps([], laps_df, track, montage=True)
+
+        assert len(capture.images) == 1
+
+    def test_plot_trajectories(self, steps_df):
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
+        _, ax = plt.subplots()
+        lines = PlottingUtils.plot_trajectories(ax, steps_df, "speed")
+
+        # one segment less than steps in each episode
+        assert len(lines.get_segments()) == steps_df.shape[0] - 10
+        assert np.array_equal(lines.get_segments()[0], [[1, 0], [2, 0]])
+        assert np.array_equal(lines.get_array()[:4], steps_df["speed"].iloc[:4])
+
+        single = PlottingUtils.plot_trajectories(ax, steps_df, group=None)
+        assert len(single.get_segments()) == steps_df.shape[0] - 1
+        plt.close("all")
+
+
+class TestPartition:
+    def test_sorted(self, steps_df):
+        parts = AnalysisUtils.partition(steps_df, "episode", [7, 2, 42])
+
+        assert [i for i, _ in parts] == [7, 2, 42]
+        pd.testing.assert_frame_equal(parts[0][1], steps_df[steps_df["episode"] == 7])
+        pd.testing.assert_frame_equal(parts[1][1], steps_df[steps_df["episode"] == 2])
+        assert parts[2][1].empty
+        assert np.shares_memory(parts[0][1]["x"].to_numpy(), steps_df["x"].to_numpy())
+
+    def test_unsorted(self, steps_df):
+        shuffled = steps_df.sample(frac=1, random_state=0)
+        parts = AnalysisUtils.partition(shuffled, "iteration")
+
+        assert [i for i, _ in parts] == [1, 2, 3]
+        for i, part in parts:
+            pd.testing.assert_frame_equal(part, shuffled[shuffled["iteration"] == i])
+
+
+class TestLapMetrics:
+    def expected(self, df):
+        rows = []
+        for episode, episode_df in df.groupby("episode"):
+            distance = np.hypot(np.diff(episode_df["x"]), np.diff(episode_df["y"])).sum()
+            lap_time = float(episode_df["tstamp"].max() - episode_df["tstamp"].min())
+            rows.append({
+                "episode": episode,
+                "distance": distance,
+                "lap_time": lap_time,
+                "velocity": distance / lap_time,
+                "average_speed": episode_df["speed"].mean(),
+                "progress": episode_df["progress"].max(),
+            })
+        return pd.DataFrame(rows)
+
+    def test_sorted(self, steps_df):
+        metrics = AnalysisUtils.lap_metrics(steps_df)
+
+        pd.testing.assert_frame_equal(metrics, self.expected(steps_df))
+        assert list(metrics["distance"]) == [4, 5, 6] * 3 + [4]
+
+    def test_interleaved(self, steps_df):
+        interleaved = steps_df.sort_values(["steps", "episode"])
+
+        pd.testing.assert_frame_equal(
+            AnalysisUtils.lap_metrics(interleaved), self.expected(steps_df))
+
+    def test_single_episode(self, steps_df):
+        episode_df = steps_df[steps_df["episode"] == 3]
+        metrics = AnalysisUtils.lap_metrics(episode_df, group=None)
+
+        assert list(metrics.columns) == [
+            "distance", "lap_time", "velocity", "average_speed", "progress"]
+        assert metrics["distance"].iloc[0] == 4
+        assert AnalysisUtils.lap_metrics(episode_df.iloc[:0]).empty
@@ -0,0 +1,59 @@
+import os
+
+import matplotlib
+import pytest
+
+from deepracer.logs import BatchRenderer, FigureCapture, PlottingUtils
+
+matplotlib.use("Agg")
+
+PNG_SIGNATURE = b"\x89PNG"
+
+
+class TestFigureCapture:
+    def test_capture(self, track, steps_df):
+        with FigureCapture() as png, FigureCapture(format="svg") as svg:
+            PlottingUtils.plot_track(steps_df, track)
+
+        assert png.images == []
+        assert len(svg.images) == 1
+        assert b"<svg" in svg.images[0]
+
+        with FigureCapture() as png:
+            PlottingUtils.plot_track(steps_df, track, resolution=20)
+            PlottingUtils.plot_selected_laps([1, 2], steps_df, track)
+
+        assert len(png.images) == 2
+        assert all(i.startswith(PNG_SIGNATURE) for i in png.images)
+
+
+class TestBatchRenderer:
+    def test_render_bytes(self, track, steps_df):
+        results = BatchRenderer(steps_df, track).render([
+            ("grid_world", [0, 4]),
+            {"kind": "laps", "ids": [1, 2, 3]},
+            {"kind": "track", "ids": [1], "column": "iteration",
+             "kwargs": {"resolution": 20}},
+        ])
+
+        assert [len(images) for images in results] == [2, 1, 1]
+        assert all(i.startswith(PNG_SIGNATURE) for images in results for i in images)
+
+    def test_render_empty_ids(self, track, steps_df):
+        results = BatchRenderer(steps_df, track).render([("grid_world", []), ("track", [])])
+
+        assert results == [[], []]
+
+    def test_render_files_in_processes(self, track, steps_df, tmpdir):
+        results = BatchRenderer(steps_df, track, n_jobs=2).render(
+            [("grid_world", [0]), {"kind": "laps", "ids": [1, 2], "name": "laps"}],
+            output_dir=str(tmpdir))
+
+        assert results == [[os.path.join(str(tmpdir), "000_grid_world.png")],
+                           [os.path.join(str(tmpdir), "laps.png")]]
+        with open(results[1][0], "rb") as f:
+            assert f.read().startswith(PNG_SIGNATURE)
+
+    def test_unknown_kind(self, track, steps_df):
+        with pytest.raises(Exception):
+            BatchRenderer(steps_df, track).render([("unknown", [1])])
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from deepracer.logs import EpisodeReplay
+
+
+@pytest.fixture
+def steps_df():
+    lengths = {1: 10, 2: 7, 3: 12}
+    rows = []
+    for episode, length in lengths.items():
+        for step in range(length):
+            angle = step / 10
+            rows.append({
+                "episode": episode,
+                "steps": step + 1,
+                "x": 3 * np.cos(angle),
+                "y": 1.5 * np.sin(angle),
+                "heading": np.degrees(angle) + 90,
+                "speed": 1.0 + episode + step / 10,
+            })
+    return pd.DataFrame(rows)
+
+
+class TestEpisodeReplay:
+    def test_frames(self, steps_df, track):
+        replay = EpisodeReplay(steps_df, track, episodes=[2, 1], step=3)
+
+        assert replay.episodes == [2, 1]
+        assert replay.n_frames == 4
+        # episode 2 has 7 steps and stays at its last one, episode 1 follows it
+        assert replay.frame_rows.tolist() == [[0, 7], [3, 10], [6, 13], [6, 16]]
+        assert replay.values[replay.frame_rows[-1]].tolist() == [3.6, 2.9]
+        np.testing.assert_allclose(replay.dx[0], 0, atol=1e-12)
+
+    def test_frames_rendered(self, steps_df, track):
+        frames = list(EpisodeReplay(steps_df, track, figsize=(4, 3)).frames(dpi=50))
+
+        assert len(frames) == 12
+        assert frames[0].shape == (150, 200, 4)
+        assert not np.array_equal(frames[0], frames[-1])
+
+    def test_scene_drawn_once(self, steps_df, track):
+        from matplotlib.figure import Figure
+
+        ax = Figure().add_subplot(1, 1, 1)
+        replay = EpisodeReplay(steps_df, track, ax=ax)
+        replay.animation()
+        artists = (len(ax.collections), len(ax.lines), len(ax.figure.axes))
+
+        list(replay.frames(dpi=30))
+        replay.animation()
+
+        assert (len(ax.collections), len(ax.lines), len(ax.figure.axes)) == artists
+
+    def test_save_gif(self, steps_df, track, tmp_path):
+        from PIL import Image
+
+        path = str(tmp_path / "replay.gif")
+        replay = EpisodeReplay(steps_df, track, step=2, figsize=(4, 3))
+        replay.save(path, dpi=50)
+
+        frames = [Image.fromarray(frame).convert("RGB") for frame in replay.frames(dpi=50)]
+        palette = frames[0].quantize()
+        with Image.open(path) as image:
+            assert image.n_frames == 6
+            assert image.info["loop"] == 0
+            image.seek(5)
+            expected = frames[5].quantize(palette=palette, dither=Image.NONE).convert("RGB")
+            assert np.array_equal(np.asarray(image.convert("RGB")), np.asarray(expected))
+
+    def test_missing_episodes(self, steps_df, track):
+        with pytest.raises(Exception):
+            EpisodeReplay(steps_df, track, episodes=[42])
@@ -0,0 +1,104 @@
+import base64
+import os
+
+import matplotlib
+import numpy as np
+import pandas as pd
+import pytest
+
+from deepracer.logs import TrainingReport
+from deepracer.logs.render import _aggregates
+
+matplotlib.use("Agg")
+
+
+@pytest.fixture
+def workers_df():
+    # two iterations of two workers, episodes are numbered from 0 in each of them
+    rows = []
+    tstamp = 1600000000.0
+    for iteration in range(2):
+        for worker in range(2):
+            for episode in range(3):
+                fast = (iteration, worker, episode) == (1, 1, 2)
+                complete = fast or episode == 2
+                for step in range(20):
+                    tstamp += 0.05 if fast else 0.1
+                    angle = step / 20 * 2 * np.pi
+                    rows.append({
+                        "iteration": iteration, "worker": worker, "episode": episode,
+                        "steps": step + 1, "x": 3 * np.cos(angle), "y": 1.5 * np.sin(angle),
+                        "action": step % 2, "steering_angle": 15 * (step % 2), "speed": 1.0,
+                        "reward": 1.0, "progress": (100 if complete else 50) * (step + 1) / 20,
+                        "closest_waypoint": step, "tstamp": tstamp,
+                    })
+    return pd.DataFrame(rows)
+
+
+def build_report(df, track, cache_dir):
+    report = TrainingReport(df, track, title="Model <1>", cache_dir=cache_dir)
+    report.add("track", "Heatmap", resolution=20)
+    report.add("laps", ids=[1, 2])
+    report.add_table("Steps", df.head())
+    report.add("grid_world", ids=[5])
+    return report
+
+
+class TestTrainingReport:
+    def test_write(self, track, steps_df, tmp_path):
+        path = build_report(steps_df, track, None).write(str(tmp_path / "report.html"))
+
+        with open(path) as f:
+            content = f.read()
+
+        assert "<title>Model &lt;1&gt;</title>" in content
+        assert "<h2>Heatmap</h2>" in content and "<h2>laps</h2>" in content
+        assert content.count('<img src="data:image/png;base64,') == 3
+        assert content.count("<table") == 1
+
+        image = content.split("base64,")[1].split('"')[0]
+        assert base64.b64decode(image).startswith(b"\x89PNG")
+
+    def test_cache(self, track, steps_df, tmp_path):
+        cache_dir = str(tmp_path / "cache")
+        images = build_report(steps_df, track, cache_dir).render()
+
+        assert images[2] is None
+        assert len(os.listdir(cache_dir)) == 3
+        assert build_report(steps_df, track, cache_dir).render() == images
+
+        # only figures including episode 5 are rendered again
+        changed = steps_df.copy()
+        changed.loc[changed["episode"] == 5, "speed"] += 1
+        changed_images = build_report(changed, track, cache_dir).render()
+
+        assert len(os.listdir(cache_dir)) == 5
+        assert changed_images[1] == images[1]
+
+    def test_unknown_kind(self, track, steps_df):
+        with pytest.raises(Exception):
+            TrainingReport(steps_df, track).add("pie_chart")
+
+    def test_default_best_laps(self, track, workers_df):
+        from deepracer.logs import AnalysisUtils
+
+        per_iteration = TrainingReport(workers_df, track).add_defaults(best_laps=1)
+        workers_df["unique_episode"] = np.arange(workers_df.shape[0]) // 20
+        unique = TrainingReport(workers_df, track).add_defaults(best_laps=1)
+
+        for report in (per_iteration, unique):
+            job = report.sections[-1]["job"]
+            assert report.sections[-1]["title"] == "Best laps"
+            assert job["column"] == "unique_episode" and len(job["ids"]) == 1
+
+            (_, lap), = AnalysisUtils.partition(report.df, job["column"], job["ids"])
+            assert list(lap.groupby(["iteration", "worker", "episode"]).groups) == \
+                [(1, 1, 2)]
+
+            # the table counts the episodes of both workers, as the figures do
+            table = report.sections[1]["table"]
+            assert list(table["episodes"]) == [6, 6]
+            pd.testing.assert_frame_equal(
+                table, AnalysisUtils.training_progress(_aggregates(report.df)))
+
+        assert per_iteration.render()[-1][0].startswith(b"\x89PNG")
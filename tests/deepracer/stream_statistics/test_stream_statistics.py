@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from deepracer.logs import QuantileSketch, RollingStatistics, StreamingStatistics
+
+
+class TestRollingStatistics:
+    def test_matches_pandas(self):
+        values = pd.Series(np.random.default_rng(0).normal(100, 30, 500))
+        values[[3, 50, 51, 52, 300]] = np.nan
+
+        statistics = RollingStatistics(20, quantiles=[0.5, 0.9], min_periods=5, alpha=0.1)
+        result = pd.DataFrame([statistics.update(v) for v in values])
+
+        rolling = values.rolling(20, min_periods=5)
+        assert np.allclose(result["mean"], rolling.mean(), equal_nan=True)
+        assert np.allclose(result["q50"], rolling.quantile(0.5), equal_nan=True)
+        assert np.allclose(result["q90"], rolling.quantile(0.9), equal_nan=True)
+        assert np.allclose(result["ewm"], values.ewm(alpha=0.1).mean(), equal_nan=True)
+
+
+class TestStreamingStatistics:
+    def test_update_frame(self):
+        rng = np.random.default_rng(1)
+        df = pd.DataFrame({"reward": rng.uniform(0, 100, 60), "progress": rng.uniform(0, 100, 60)})
+
+        statistics = StreamingStatistics(["reward", "progress"], window=7, span=5,
+                                         keep_history=True)
+        first = statistics.update_frame(df.iloc[:25])
+        second = statistics.update_frame(df.iloc[25:])
+
+        assert list(second.index) == list(range(25, 60))
+        result = statistics.dataframe()
+        pd.testing.assert_frame_equal(pd.concat([first, second]), result)
+        assert np.allclose(result["progress_mean"], df["progress"].rolling(7, min_periods=1).mean())
+        assert np.allclose(result["reward_q50"], df["reward"].rolling(7, min_periods=1).median())
+        assert np.allclose(result["reward_ewm"], df["reward"].ewm(span=5).mean())
+
+    def test_history_not_kept_by_default(self):
+        statistics = StreamingStatistics(["reward"], window=3)
+        for value in range(100):
+            row = statistics.update({"reward": value})
+
+        assert row["reward_mean"] == 98
+        assert statistics._rows is None
+        with pytest.raises(Exception):
+            statistics.dataframe()
+
+
+class TestQuantileSketch:
+    def test_merged_quantiles(self):
+        rng = np.random.default_rng(2)
+        values = np.concatenate([rng.lognormal(3, 0.5, 200000), [np.inf, np.nan]])
+
+        sketch = QuantileSketch()
+        for part in np.array_split(values, 10):
+            sketch.merge(QuantileSketch.from_values(part))
+
+        assert sketch.count == 200000
+        assert len(sketch.centroids()[0]) <= 101
+        assert sketch.min == np.min(values[:-2]) and sketch.max == np.max(values[:-2])
+
+        finite = np.sort(values[:-2])
+        for q, estimate in zip([0.01, 0.5, 0.9, 0.99], sketch.quantile([0.01, 0.5, 0.9, 0.99])):
+            rank = np.searchsorted(finite, estimate) / finite.shape[0]
+            assert abs(rank - q) < 0.002
+
+    def test_empty(self):
+        assert np.isnan(QuantileSketch().quantile(0.5))